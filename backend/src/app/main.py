@@ -2,13 +2,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from utils.logging_util import logging_util
 
-from .router import root, analyze
+from .router import root, analyze, stats
 
 logger = logging_util.get_logger(__name__)
 
 app = FastAPI()
 app.include_router(root.router)
 app.include_router(analyze.router)
+app.include_router(stats.router)
 
 origins = ["*"]  # Allow requests from all origins
 
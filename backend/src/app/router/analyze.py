@@ -2,7 +2,6 @@ import asyncio
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
 
-from utils.github_util import github_util
 from core.models import AnalyzeResponse, StatusResponse, SubmitAnalysisResponse
 from services.analysis_service import analysis_service
 from utils.logging_util import logging_util
@@ -13,20 +12,21 @@ logger = logging_util.get_logger(__name__)
 
 @router.get("/api/analyze/{username}")
 async def analyze(username: str, skip_quality_metrics: bool = False) -> AnalyzeResponse:
-    """Fetches user data from the GitHub API."""
-    user = github_util.get_user(username)
-    name = username
-    if user is not None:
-        name = user.name if user.name is not None else username
-    experience_metrics, quality_metrics = analysis_service.analyze('', username, skip_quality_metrics)
-    response = AnalyzeResponse(username=username, name=name, message="Analyzed user", experience_metrics=experience_metrics, quality_metrics=quality_metrics)
+    """Analyzes a user through the job queue and waits for the result."""
+    # Blocking work runs in worker threads so the event loop keeps serving other requests
+    analysis_id, name = await asyncio.to_thread(analysis_service.submit_analysis, username, skip_quality_metrics)
+    if analysis_id is None:
+        return AnalyzeResponse(username=username, name=username, message="Failed to submit analysis", experience_metrics=None, quality_metrics=None)
+    analysis = analysis_service.get_analysis(analysis_id)
+    await asyncio.wrap_future(analysis.completed)
+    response = AnalyzeResponse(username=username, name=name, message="Analyzed user", experience_metrics=analysis.experience_metrics, quality_metrics=analysis.quality_metrics)
     return response
 
 
 @router.post("/api/submit/{username}")
-async def submit_analysis(username: str, skip_quality_metrics: bool = False) -> SubmitAnalysisResponse:
+async def submit_analysis(username: str, skip_quality_metrics: bool = False, priority: int = 0) -> SubmitAnalysisResponse:
     logger.info(f"Submitting analysis for username: {username}")
-    analysis_id, name = analysis_service.submit_analysis(username, skip_quality_metrics)
+    analysis_id, name = await asyncio.to_thread(analysis_service.submit_analysis, username, skip_quality_metrics, priority)
     logger.info(f'Analysis ID generated for {username}: {analysis_id}')
     
     if analysis_id is None:
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from core.models import HttpStatsResponse
+from utils.http_sessions import http_sessions
+from utils.logging_util import logging_util
+
+logger = logging_util.get_logger(__name__)
+router = APIRouter()
+
+@router.get("/api/stats/http")
+def http_stats() -> HttpStatsResponse:
+    """Connection reuse of the pooled HTTP sessions, per host."""
+    return HttpStatsResponse(hosts=http_sessions.stats())
@@ -10,15 +10,83 @@ class Config:
     GITHUB_ACCESS_TOKEN = os.getenv("GITHUB_ACCESS_TOKEN", "")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
     GITHUB_REPO_BASE_URL = "https://github.com/"
+    GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+    # Commit search pages fetched at once; the search API allows 30 requests a minute
+    GITHUB_SEARCH_CONCURRENCY = int(os.getenv("GITHUB_SEARCH_CONCURRENCY", "3"))
+    # Search only for commits authored since a user's last discovery and merge them with the stored ones
+    INCREMENTAL_DISCOVERY = os.getenv("INCREMENTAL_DISCOVERY", "true").lower() == "true"
+    # Commits whose quality scan came back empty aren't scanned again for this long
+    QUALITY_RETRY_AFTER_SECONDS = int(os.getenv("QUALITY_RETRY_AFTER_SECONDS", str(7 * 24 * 3600)))
+    # Stored results younger than this are served without checking GitHub for new commits
+    RESULT_CACHE_MAX_AGE_SECONDS = int(os.getenv("RESULT_CACHE_MAX_AGE_SECONDS", "3600"))
+    # Conditional-request cache for GitHub API responses, kept in MongoDB
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    HTTP_CACHE_TTL_SECONDS = int(os.getenv("HTTP_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "10000"))
     SONARQUBE_URL = os.getenv("SONARQUBE_URL", "")
     SONARQUBE_TOKEN = os.getenv("SONARQUBE_TOKEN", "")
     SONARQUBE_USER_TOKEN = os.getenv("SONARQUBE_USER_TOKEN", "")
     SONAR_CLOUD_TOKEN = os.getenv("SONAR_CLOUD_TOKEN", "")
     SONAR_CLOUD_ORGANIZATION = os.getenv("SONAR_CLOUD_ORGANIZATION", "")
+    # Pooled HTTP sessions used for SonarQube and GitHub REST calls
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+    HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+    # Polling of SonarQube analysis tasks: the interval backs off from the minimum to the maximum
+    SONAR_TASK_POLL_MIN_SECONDS = float(os.getenv("SONAR_TASK_POLL_MIN_SECONDS", "0.5"))
+    SONAR_TASK_POLL_MAX_SECONDS = float(os.getenv("SONAR_TASK_POLL_MAX_SECONDS", "10"))
+    SONAR_TASK_TIMEOUT_SECONDS = float(os.getenv("SONAR_TASK_TIMEOUT_SECONDS", "600"))
+    # Pages of file measures fetched at once after a scan
+    SONAR_MEASURES_CONCURRENCY = int(os.getenv("SONAR_MEASURES_CONCURRENCY", "4"))
+    # Scan only the files a commit changed instead of the whole repository
+    QUALITY_SCAN_CHANGED_FILES_ONLY = os.getenv("QUALITY_SCAN_CHANGED_FILES_ONLY", "true").lower() == "true"
     BASE_DIR = os.getenv("BASE_DIR", "/tmp/local_repo_dir/base")
     MONGO_CONNECTION_STRING = os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017")
     MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "github_metrics")
 
+    # Bare mirror cache for cloned repositories
+    REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR", os.path.join(BASE_DIR, "mirrors"))
+    REPO_WORKTREE_DIR = os.getenv("REPO_WORKTREE_DIR", os.path.join(BASE_DIR, "worktrees"))
+    REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+    # Blob content loading; header-only mode keeps just the start of each file, which is enough for import detection
+    BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(1024 * 1024)))
+    BLOB_HEADER_ONLY = os.getenv("BLOB_HEADER_ONLY", "false").lower() == "true"
+    BLOB_HEADER_BYTES = int(os.getenv("BLOB_HEADER_BYTES", str(16 * 1024)))
+
+    # Blob-level detection cache; the persistent tier lives in MongoDB
+    DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "100000"))
+    DETECTION_CACHE_PERSIST = os.getenv("DETECTION_CACHE_PERSIST", "true").lower() == "true"
+    # Stop scanning a file for imports once its import block has ended (e.g. at the first top-level def in Python).
+    # Faster, but misses imports below that point, e.g. imports inside Python functions or PHP trait uses in classes
+    IMPORT_SCAN_EARLY_EXIT = os.getenv("IMPORT_SCAN_EARLY_EXIT", "false").lower() == "true"
+    # Find imports from diff hunks, reparsing a file's header only when its import region changes
+    HUNK_IMPORT_DETECTION = os.getenv("HUNK_IMPORT_DETECTION", "false").lower() == "true"
+    # Number of commits whose files are scored for frameworks in one batch
+    SKILLS_BATCH_SIZE = int(os.getenv("SKILLS_BATCH_SIZE", "100"))
+    # Analyses run on a fixed pool of workers fed from a bounded queue
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+    ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "100"))
+    # Analysis pipeline: workers per stage, items per queue between stages, and how many
+    # fetched repositories may wait for extraction
+    FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "2"))
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+    DETECT_WORKERS = int(os.getenv("DETECT_WORKERS", "2"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+    PIPELINE_PREFETCH_REPOS = int(os.getenv("PIPELINE_PREFETCH_REPOS", "2"))
+    # Scanner processes running at once across all analyses, and worktrees kept per repository for them
+    QUALITY_SCAN_CONCURRENCY = int(os.getenv("QUALITY_SCAN_CONCURRENCY", "4"))
+    QUALITY_WORKTREES_PER_REPO = int(os.getenv("QUALITY_WORKTREES_PER_REPO", "2"))
+    # Scans of one analysis in flight, including those waiting for the server to process them
+    QUALITY_SCANS_IN_FLIGHT = int(os.getenv("QUALITY_SCANS_IN_FLIGHT", "16"))
+    # Worker processes for skill detection (0 detects in the analysis threads) and blobs per task
+    SKILLS_PROCESS_WORKERS = int(os.getenv("SKILLS_PROCESS_WORKERS", "0"))
+    SKILLS_PROCESS_CHUNK_SIZE = int(os.getenv("SKILLS_PROCESS_CHUNK_SIZE", "50"))
+    # Commit metrics are buffered and written in bulk once this many are collected or the oldest is this old
+    METRICS_WRITE_BATCH_SIZE = int(os.getenv("METRICS_WRITE_BATCH_SIZE", "200"))
+    METRICS_WRITE_MAX_DELAY_SECONDS = float(os.getenv("METRICS_WRITE_MAX_DELAY_SECONDS", "5"))
+
     # Log important config values (but not sensitive ones)
     logger.info(f"BASE_DIR: {os.getenv('BASE_DIR', '/Users/anish/projects/github-analyzer/backend/local_repo_dir/base')}")
     logger.info(f"MONGO_DB_NAME: {os.getenv('MONGO_DB_NAME', 'github_metrics')}")
\ No newline at end of file
@@ -65,6 +65,15 @@ class FileQualityMetrics:
     maintainability_rating: float | None
     
 
+@dataclass
+class DiffHunk:
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    added_lines: list[str] = field(default_factory=list)
+    removed_lines: list[str] = field(default_factory=list)
+
 @dataclass
 class FileInfo:
     file_path: str
@@ -76,6 +85,25 @@ class FileInfo:
     language: Optional[str] = None
     frameworks: Optional[list[str]] = None
     content: Optional[str] = None
+    blob_sha: Optional[str] = None
+    previous_blob_sha: Optional[str] = None
+    hunks: Optional[list[DiffHunk]] = None
+
+@dataclass
+class BlobDetection:
+    blob_sha: str
+    file_extension: str
+    language: str | None
+    imports: list[str]
+    frameworks: list[str]
+    detector_version: str
+
+@dataclass
+class CommitMarker:
+    """Records that a commit was analyzed but produced no metrics, so it isn't analyzed again."""
+    commit_hash: str
+    reason: str
+    detector_version: str
 
 @dataclass
 class CommitDetails:
@@ -99,11 +127,37 @@ class User:
     name: str
     repos: list[RepoDetails]
 
+@dataclass
+class UserAnalysisResult:
+    username: str
+    name: str
+    skip_quality_metrics: bool
+    # Hash of the analyzed commit SHAs; None if some commits couldn't be analyzed
+    commit_fingerprint: Optional[str]
+    commit_count: int
+    detector_version: str
+    experience_metrics: OverallExperienceMetrics
+    quality_metrics: Optional[OverallQualityMetrics]
+    analyzed_at: datetime
+
 @dataclass
 class AnalysisStatus:
     total_commits: int
     analyzed_commits: int
     analysis_completed: bool
+    # Lower values run first
+    priority: int = 0
+    # Number of queued analyses that run before this one; None once it has started
+    queue_position: Optional[int] = None
+
+@dataclass
+class HostConnectionStats:
+    host: str
+    requests: int
+    connections_opened: int
+    connections_reused: int
+    idle_connections: int
+    pool_size: int
 
 class AnalyzeResponse(BaseModel):
     username: str = Field(..., title="Github username", description="The username of the github profile to analyze")
@@ -120,4 +174,7 @@ class SubmitAnalysisResponse(BaseModel):
 
 class StatusResponse(BaseModel):
     analysis_id: str = Field(..., title="Analysis ID", description="The id of the analysis")
-    status: AnalysisStatus = Field(..., title="Analysis status", description="The status of the analysis")
\ No newline at end of file
+    status: AnalysisStatus = Field(..., title="Analysis status", description="The status of the analysis")
+
+class HttpStatsResponse(BaseModel):
+    hosts: list[HostConnectionStats] = Field(..., title="Hosts", description="Connection reuse of the pooled HTTP sessions per host")
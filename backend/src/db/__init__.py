@@ -1,8 +1,9 @@
 from .db import MongoDB
+from .write_buffer import MetricsWriteBuffer
 from config import Config
 
 # Create a singleton instance
 db = MongoDB(Config.MONGO_CONNECTION_STRING, Config.MONGO_DB_NAME)
 
 # Export the instance
-__all__ = ["db"] 
\ No newline at end of file
+__all__ = ["db", "MetricsWriteBuffer"] 
\ No newline at end of file
@@ -1,9 +1,14 @@
-from pymongo import MongoClient
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import OperationFailure
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
 from utils.logging_util import logging_util
 
-from core.models import CommitExperienceMetrics, CommitQualityMetrics
+from core.models import BlobDetection, CommitMarker, CommitExperienceMetrics, CommitQualityMetrics, ExperienceMetrics, OverallExperienceMetrics, OverallQualityMetrics, QualityMetrics, UserAnalysisResult
+
+# Commit hashes per $in query when looking up metrics in bulk
+COMMIT_HASH_QUERY_CHUNK = 1000
 
 class MongoDB:
     def __init__(self, connection_string: str, db_name: str):
@@ -16,12 +21,46 @@ class MongoDB:
         # Collections
         self.commit_experience_metrics = self.db["commit_experience_metrics"]
         self.commit_quality_metrics = self.db["commit_quality_metrics"]
+        self.blob_detections = self.db["blob_detections"]
+        self.http_cache = self.db["http_cache"]
+        self.discovered_commits = self.db["discovered_commits"]
+        self.discovery_watermarks = self.db["discovery_watermarks"]
+        self.user_results = self.db["user_results"]
+        self.commit_markers = self.db["commit_markers"]
         
         # Create indexes
         self.logger.info("Creating indexes for collections")
-        self.commit_experience_metrics.create_index("commit_hash")
-        self.commit_quality_metrics.create_index("commit_hash")
+        # Unique, so concurrent upserts of the same commit can't create duplicates
+        self._ensure_unique_commit_hash_index(self.commit_experience_metrics)
+        self._ensure_unique_commit_hash_index(self.commit_quality_metrics)
+        self.blob_detections.create_index(
+            [("blob_sha", ASCENDING), ("file_extension", ASCENDING), ("detector_version", ASCENDING)],
+            unique=True
+        )
+        self.http_cache.create_index("key", unique=True)
+        self.http_cache.create_index("last_used_at")
+        # MongoDB removes entries once they pass expires_at
+        self.http_cache.create_index("expires_at", expireAfterSeconds=0)
+        self.discovered_commits.create_index([("username", ASCENDING), ("sha", ASCENDING)], unique=True)
+        self.discovery_watermarks.create_index("username", unique=True)
+        self.commit_markers.create_index([("commit_hash", ASCENDING), ("reason", ASCENDING)], unique=True)
+        # Markers saved with an expires_at are removed by MongoDB after it; the others are kept
+        self.commit_markers.create_index("expires_at", expireAfterSeconds=0)
+        self.user_results.create_index([("username", ASCENDING), ("skip_quality_metrics", ASCENDING)], unique=True)
     
+    def _ensure_unique_commit_hash_index(self, collection):
+        """Create the unique commit_hash index, replacing the non-unique one older versions created."""
+        index = collection.index_information().get("commit_hash_1")
+        if index is not None and not index.get("unique", False):
+            self.logger.info(f"Replacing non-unique commit_hash index on {collection.name}")
+            collection.drop_index("commit_hash_1")
+        try:
+            collection.create_index("commit_hash", unique=True)
+        except OperationFailure as e:
+            # Duplicates saved before the index existed have to be cleaned up first
+            self.logger.error(f"Failed to create unique commit_hash index on {collection.name}: {e}")
+            collection.create_index("commit_hash")
+
     # Experience Metrics Functions
     def find_commit_experience_metrics(self, commit_hash: str) -> Optional[CommitExperienceMetrics]:
         """Find commit experience metrics by commit hash."""
@@ -34,6 +73,16 @@ class MongoDB:
             self.logger.debug(f"No experience metrics found for commit: {commit_hash}")
             return None
             
+        return self._to_commit_experience_metrics(result)
+
+    def find_commit_experience_metrics_many(self, commit_hashes: List[str]) -> Dict[str, CommitExperienceMetrics]:
+        """Find experience metrics for many commits, keyed by commit hash. Commits without metrics are left out."""
+        return {
+            result["commit_hash"]: self._to_commit_experience_metrics(result)
+            for result in self._find_by_commit_hashes(self.commit_experience_metrics, commit_hashes)
+        }
+
+    def _to_commit_experience_metrics(self, result: Dict[str, Any]) -> CommitExperienceMetrics:
         return CommitExperienceMetrics(
             skills=set(result.get("skills", [])),
             lines_of_code=result.get("lines_of_code", {}),
@@ -44,12 +93,15 @@ class MongoDB:
     def save_commit_experience_metrics(self, 
                                       repo_url: str, 
                                       commit_hash: str, 
-                                      metrics: CommitExperienceMetrics) -> str:
+                                      metrics: CommitExperienceMetrics):
         """Save commit experience metrics. If exists, update it."""
-        existing = self.commit_experience_metrics.find_one({
-            "commit_hash": commit_hash
-        })
-        
+        self.commit_experience_metrics.bulk_write([self.commit_experience_metrics_upsert(repo_url, commit_hash, metrics)])
+
+    def commit_experience_metrics_upsert(self,
+                                         repo_url: str,
+                                         commit_hash: str,
+                                         metrics: CommitExperienceMetrics) -> UpdateOne:
+        """Build the upsert that saves commit experience metrics, for use in a bulk write."""
         data = {
             "commit_hash": commit_hash,
             "repo_url": repo_url,
@@ -58,17 +110,11 @@ class MongoDB:
             "timestamp": metrics.timestamp,
             "updated_at": datetime.utcnow()
         }
-        
-        if existing:
-            self.commit_experience_metrics.update_one(
-                {"_id": existing["_id"]},
-                {"$set": data}
-            )
-            return str(existing["_id"])
-        else:
-            data["created_at"] = datetime.utcnow()
-            result = self.commit_experience_metrics.insert_one(data)
-            return str(result.inserted_id)
+        return UpdateOne(
+            {"commit_hash": commit_hash},
+            {"$set": data, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
     
     # Quality Metrics Functions
     def find_commit_quality_metrics(self, commit_hash: str) -> Optional[CommitQualityMetrics]:
@@ -80,6 +126,16 @@ class MongoDB:
         if not result:
             return None
             
+        return self._to_commit_quality_metrics(result)
+
+    def find_commit_quality_metrics_many(self, commit_hashes: List[str]) -> Dict[str, CommitQualityMetrics]:
+        """Find quality metrics for many commits, keyed by commit hash. Commits without metrics are left out."""
+        return {
+            result["commit_hash"]: self._to_commit_quality_metrics(result)
+            for result in self._find_by_commit_hashes(self.commit_quality_metrics, commit_hashes)
+        }
+
+    def _to_commit_quality_metrics(self, result: Dict[str, Any]) -> CommitQualityMetrics:
         return CommitQualityMetrics(
             timestamp=result["timestamp"],
             skills=set(result.get("skills", [])),
@@ -97,12 +153,15 @@ class MongoDB:
     def save_commit_quality_metrics(self, 
                                    repo_url: str, 
                                    commit_hash: str, 
-                                   metrics: CommitQualityMetrics) -> str:
+                                   metrics: CommitQualityMetrics):
         """Save commit quality metrics. If exists, update it."""
-        existing = self.commit_quality_metrics.find_one({
-            "commit_hash": commit_hash
-        })
-        
+        self.commit_quality_metrics.bulk_write([self.commit_quality_metrics_upsert(repo_url, commit_hash, metrics)])
+
+    def commit_quality_metrics_upsert(self,
+                                      repo_url: str,
+                                      commit_hash: str,
+                                      metrics: CommitQualityMetrics) -> UpdateOne:
+        """Build the upsert that saves commit quality metrics, for use in a bulk write."""
         data = {
             "commit_hash": commit_hash,
             "repo_url": repo_url,
@@ -119,18 +178,223 @@ class MongoDB:
             "maintainability_rating": metrics.maintainability_rating,
             "updated_at": datetime.utcnow()
         }
-        
-        if existing:
-            self.commit_quality_metrics.update_one(
-                {"_id": existing["_id"]},
-                {"$set": data}
-            )
-            return str(existing["_id"])
-        else:
-            data["created_at"] = datetime.utcnow()
-            result = self.commit_quality_metrics.insert_one(data)
-            return str(result.inserted_id)
+        return UpdateOne(
+            {"commit_hash": commit_hash},
+            {"$set": data, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
     
+    def _find_by_commit_hashes(self, collection, commit_hashes: List[str]):
+        """Yield the documents of a metrics collection for the given commits, querying in chunks of $in values."""
+        unique_hashes = list(dict.fromkeys(commit_hashes))
+        for start in range(0, len(unique_hashes), COMMIT_HASH_QUERY_CHUNK):
+            yield from collection.find(
+                {"commit_hash": {"$in": unique_hashes[start:start + COMMIT_HASH_QUERY_CHUNK]}},
+                {"_id": 0, "created_at": 0, "updated_at": 0}
+            )
+
+    # Commit Marker Functions
+    def find_commit_markers_many(self, commit_hashes: List[str], detector_version: str) -> Dict[str, set]:
+        """Find the marker reasons of many commits produced by the given detector version, keyed by commit hash."""
+        markers = dict[str, set]()
+        for result in self._find_by_commit_hashes(self.commit_markers, commit_hashes):
+            if result.get("detector_version") != detector_version:
+                continue
+            # The TTL monitor only runs every minute, so expired markers can still be returned
+            expires_at = result.get("expires_at")
+            if expires_at is not None and expires_at < datetime.utcnow():
+                continue
+            markers.setdefault(result["commit_hash"], set()).add(result["reason"])
+        return markers
+
+    def commit_marker_upsert(self, marker: CommitMarker, expires_at: Optional[datetime] = None) -> UpdateOne:
+        """Build the upsert that saves a commit marker, for use in a bulk write."""
+        data = {
+            "commit_hash": marker.commit_hash,
+            "reason": marker.reason,
+            "detector_version": marker.detector_version,
+            "expires_at": expires_at,
+            "updated_at": datetime.utcnow()
+        }
+        return UpdateOne(
+            {"commit_hash": marker.commit_hash, "reason": marker.reason},
+            {"$set": data, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    # Blob Detection Functions
+    def find_blob_detections(self, keys: List[Tuple[str, str]], detector_version: str) -> Dict[Tuple[str, str], BlobDetection]:
+        """Find cached detections for (blob_sha, file_extension) keys produced by the given detector version."""
+        if not keys:
+            return {}
+        results = self.blob_detections.find(
+            {
+                "blob_sha": {"$in": list({blob_sha for blob_sha, _ in keys})},
+                "detector_version": detector_version
+            },
+            {"_id": 0, "created_at": 0}
+        )
+        wanted = set(keys)
+        detections = {}
+        for result in results:
+            key = (result["blob_sha"], result["file_extension"])
+            if key not in wanted:
+                continue
+            detections[key] = BlobDetection(
+                blob_sha=result["blob_sha"],
+                file_extension=result["file_extension"],
+                language=result.get("language"),
+                imports=result.get("imports", []),
+                frameworks=result.get("frameworks", []),
+                detector_version=result["detector_version"]
+            )
+        return detections
+
+    def save_blob_detections(self, detections: List[BlobDetection]):
+        """Save blob detections. Detections that already exist are left untouched."""
+        if not detections:
+            return
+        operations = [
+            UpdateOne(
+                {
+                    "blob_sha": detection.blob_sha,
+                    "file_extension": detection.file_extension,
+                    "detector_version": detection.detector_version
+                },
+                {"$setOnInsert": {
+                    "language": detection.language,
+                    "imports": detection.imports,
+                    "frameworks": detection.frameworks,
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+            for detection in detections
+        ]
+        self.blob_detections.bulk_write(operations, ordered=False)
+
+    # HTTP Cache Functions
+    def find_http_cache_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Find a cached HTTP response by its request key."""
+        return self.http_cache.find_one({"key": key}, {"_id": 0})
+
+    def save_http_cache_entry(self, entry: Dict[str, Any]):
+        """Save a cached HTTP response, replacing any previous one for the same key."""
+        self.http_cache.replace_one({"key": entry["key"]}, entry, upsert=True)
+
+    def touch_http_cache_entry(self, key: str, fields: Dict[str, Any]):
+        """Update the freshness and expiry of a cached HTTP response after it was revalidated."""
+        self.http_cache.update_one({"key": key}, {"$set": fields})
+
+    def evict_http_cache_entries(self, max_entries: int) -> int:
+        """Delete the least recently used cached HTTP responses beyond max_entries. Returns how many were deleted."""
+        excess = self.http_cache.estimated_document_count() - max_entries
+        if excess <= 0:
+            return 0
+        oldest = self.http_cache.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(excess)
+        result = self.http_cache.delete_many({"_id": {"$in": [entry["_id"] for entry in oldest]}})
+        return result.deleted_count
+
+    # Commit Discovery Functions
+    def find_discovered_commits(self, username: str) -> List[Dict[str, Any]]:
+        """Find every commit discovered so far for a user."""
+        return list(self.discovered_commits.find({"username": username}, {"_id": 0, "username": 0}))
+
+    def save_discovered_commits(self, username: str, commits: List[Dict[str, Any]]):
+        """Save discovered commits of a user, updating the ones seen before."""
+        if not commits:
+            return
+        operations = [
+            UpdateOne({"username": username, "sha": commit["sha"]}, {"$set": commit}, upsert=True)
+            for commit in commits
+        ]
+        self.discovered_commits.bulk_write(operations, ordered=False)
+
+    def find_discovery_watermark(self, username: str) -> Optional[Dict[str, Any]]:
+        """Find the latest author date and the SHAs seen at it for a user's last discovery."""
+        return self.discovery_watermarks.find_one({"username": username}, {"_id": 0})
+
+    def save_discovery_watermark(self, username: str, author_date: datetime, shas: List[str]):
+        """Save the latest author date discovered for a user and the SHAs seen at it."""
+        self.discovery_watermarks.update_one(
+            {"username": username},
+            {"$set": {"author_date": author_date, "shas": shas, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    # User Result Functions
+    def find_user_result(self, username: str, skip_quality_metrics: bool) -> Optional[UserAnalysisResult]:
+        """Find the stored overall metrics of a user's last analysis."""
+        result = self.user_results.find_one({"username": username, "skip_quality_metrics": skip_quality_metrics})
+        if not result:
+            return None
+
+        experience_metrics = OverallExperienceMetrics(skills={
+            skill: ExperienceMetrics(
+                lines_of_code=metrics["lines_of_code"],
+                first_commit_timestamp=self._as_utc(metrics["first_commit_timestamp"]),
+                last_commit_timestamp=self._as_utc(metrics["last_commit_timestamp"]),
+                repos=set(metrics["repos"])
+            )
+            for skill, metrics in result["experience_metrics"].items()
+        })
+        quality_metrics = None
+        if result.get("quality_metrics") is not None:
+            quality_metrics = OverallQualityMetrics(skills={
+                skill: QualityMetrics(**metrics) for skill, metrics in result["quality_metrics"].items()
+            })
+        return UserAnalysisResult(
+            username=result["username"],
+            name=result["name"],
+            skip_quality_metrics=result["skip_quality_metrics"],
+            commit_fingerprint=result.get("commit_fingerprint"),
+            commit_count=result["commit_count"],
+            detector_version=result["detector_version"],
+            experience_metrics=experience_metrics,
+            quality_metrics=quality_metrics,
+            analyzed_at=result["analyzed_at"]
+        )
+
+    def save_user_result(self, result: UserAnalysisResult):
+        """Save the overall metrics of a user's analysis, replacing the previous ones."""
+        data = {
+            "username": result.username,
+            "name": result.name,
+            "skip_quality_metrics": result.skip_quality_metrics,
+            "commit_fingerprint": result.commit_fingerprint,
+            "commit_count": result.commit_count,
+            "detector_version": result.detector_version,
+            "experience_metrics": {
+                skill: {
+                    "lines_of_code": metrics.lines_of_code,
+                    "first_commit_timestamp": metrics.first_commit_timestamp,
+                    "last_commit_timestamp": metrics.last_commit_timestamp,
+                    "repos": list(metrics.repos)  # Convert set to list for MongoDB
+                }
+                for skill, metrics in result.experience_metrics.skills.items()
+            },
+            "quality_metrics": {
+                skill: asdict(metrics) for skill, metrics in result.quality_metrics.skills.items()
+            } if result.quality_metrics is not None else None,
+            "analyzed_at": result.analyzed_at
+        }
+        self.user_results.replace_one(
+            {"username": result.username, "skip_quality_metrics": result.skip_quality_metrics},
+            data,
+            upsert=True
+        )
+
+    def touch_user_result(self, username: str, skip_quality_metrics: bool, analyzed_at: datetime):
+        """Mark a stored result as checked against the user's current commits."""
+        self.user_results.update_one(
+            {"username": username, "skip_quality_metrics": skip_quality_metrics},
+            {"$set": {"analyzed_at": analyzed_at}}
+        )
+
+    def _as_utc(self, timestamp: datetime) -> datetime:
+        # MongoDB returns naive datetimes in UTC
+        return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
+
     # Additional helper functions
     def get_commit_metrics_by_date_range(self, 
                                         repo_url: str, 
@@ -0,0 +1,90 @@
+import threading
+import time
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from datetime import datetime
+from typing import Optional
+from core.models import CommitExperienceMetrics, CommitMarker, CommitQualityMetrics
+from .db import MongoDB
+from utils.logging_util import logging_util
+
+
+class MetricsWriteBuffer:
+    """
+    Collects per-commit metrics and markers and writes them to MongoDB in batches.
+
+    Buffered saves are flushed as unordered bulk upserts once max_items have
+    been collected or the oldest buffered save is max_delay_seconds old.
+    Use it as a context manager so whatever is left is flushed when the
+    analysis finishes, whether it succeeded or not.
+    """
+
+    def __init__(self, db: MongoDB, max_items: int, max_delay_seconds: float):
+        self.logger = logging_util.get_logger(__name__)
+        self.db = db
+        self.max_items = max_items
+        self.max_delay_seconds = max_delay_seconds
+        self._lock = threading.Lock()
+        # Serializes flushes so batches reach MongoDB in the order they were collected
+        self._flush_lock = threading.Lock()
+        self._experience_operations = list[UpdateOne]()
+        self._quality_operations = list[UpdateOne]()
+        self._marker_operations = list[UpdateOne]()
+        self._timer = None
+
+    def __enter__(self) -> "MetricsWriteBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def save_commit_experience_metrics(self, repo_url: str, commit_hash: str, metrics: CommitExperienceMetrics):
+        self._add(self._experience_operations, self.db.commit_experience_metrics_upsert(repo_url, commit_hash, metrics))
+
+    def save_commit_quality_metrics(self, repo_url: str, commit_hash: str, metrics: CommitQualityMetrics):
+        self._add(self._quality_operations, self.db.commit_quality_metrics_upsert(repo_url, commit_hash, metrics))
+
+    def save_commit_marker(self, marker: CommitMarker, expires_at: Optional[datetime] = None):
+        self._add(self._marker_operations, self.db.commit_marker_upsert(marker, expires_at))
+
+    def _add(self, operations: list[UpdateOne], operation: UpdateOne):
+        with self._lock:
+            operations.append(operation)
+            full = len(self._experience_operations) + len(self._quality_operations) + len(self._marker_operations) >= self.max_items
+            if not full and self._timer is None:
+                # The first buffered save starts the clock for a time-based flush
+                self._timer = threading.Timer(self.max_delay_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered metrics. Errors are logged, not raised."""
+        with self._flush_lock:
+            with self._lock:
+                experience_operations, self._experience_operations = self._experience_operations, []
+                quality_operations, self._quality_operations = self._quality_operations, []
+                marker_operations, self._marker_operations = self._marker_operations, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            start = time.perf_counter()
+            for collection, operations in [
+                (self.db.commit_experience_metrics, experience_operations),
+                (self.db.commit_quality_metrics, quality_operations),
+                (self.db.commit_markers, marker_operations),
+            ]:
+                if not operations:
+                    continue
+                try:
+                    collection.bulk_write(operations, ordered=False)
+                except PyMongoError as e:
+                    self.logger.error(f"Error writing {len(operations)} metrics to {collection.name}: {e}")
+            if experience_operations or quality_operations or marker_operations:
+                self.logger.debug(
+                    f"Flushed {len(experience_operations)} experience and {len(quality_operations)} quality metrics "
+                    f"and {len(marker_operations)} markers "
+                    f"in {time.perf_counter() - start:.3f}s"
+                )
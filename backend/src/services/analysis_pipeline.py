@@ -0,0 +1,369 @@
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Optional
+from config import Config
+from core.models import AnalysisStatus, CommitDetails, CommitExperienceMetrics, CommitMarker, CommitQualityMetrics, FileInfo, RepoDetails
+from db import MetricsWriteBuffer, db
+from services.quality_scan_executor import WorktreePool, quality_scan_executor
+from utils.framework_detector import framework_detector
+from utils.hunk_import_tracker import HunkImportTracker
+from utils.local_git_util import local_git_util
+from utils.logging_util import logging_util
+from utils.metrics_util import metrics_util
+from utils.pipeline import PipelineStage
+from utils.skills_util import skills_util
+
+# Why a commit was analyzed without producing metrics
+NO_LANGUAGES = "no_languages"
+QUALITY_UNAVAILABLE = "quality_unavailable"
+
+
+@dataclass
+class RepoJob:
+    repo: RepoDetails
+    pending_commits: list[CommitDetails]
+    repo_path: Optional[str] = None
+    import_tracker: Optional[HunkImportTracker] = None
+    # Work items still holding the repository; it is released when the last one finishes
+    references: int = 0
+    # With imports tracked across commits, batches have to be detected in commit order
+    next_batch: int = 0
+    lock: threading.Condition = field(default_factory=threading.Condition)
+    # Created by the first quality scan of the repository
+    worktree_pool: Optional[WorktreePool] = None
+
+
+@dataclass
+class CommitBatch:
+    repo_job: RepoJob
+    index: int
+    commits: list[CommitDetails]
+
+
+@dataclass
+class QualityTask:
+    repo_job: RepoJob
+    commit: CommitDetails
+    excluded_files: list[FileInfo]
+
+
+@dataclass
+class CachedCommit:
+    commit_hash: str
+    experience_metrics: CommitExperienceMetrics
+    quality_metrics: Optional[CommitQualityMetrics]
+
+
+@dataclass
+class AnalyzedCommit:
+    repo_url: str
+    commit_hash: str
+    languages: list[str]
+    frameworks: list[str]
+    experience_metrics: Optional[CommitExperienceMetrics]
+
+
+@dataclass
+class SkippedCommit:
+    commit_hash: str
+    reason: str
+
+
+@dataclass
+class ScannedCommit:
+    repo_url: str
+    commit_hash: str
+    quality_metrics: Optional[CommitQualityMetrics]
+    # False if the scan couldn't run at all, which is not worth remembering
+    scanned: bool = True
+
+
+@dataclass
+class MissingCommit:
+    commit_hash: str
+
+
+class AnalysisPipeline:
+    """
+    Analyzes the commits of one user as a pipeline of stages connected by bounded queues:
+    discover -> fetch -> extract -> detect -> quality -> persist.
+
+    Each stage has its own pool of workers, so fetching the next repository
+    overlaps detection on the previous one and a slow quality scan doesn't hold
+    up experience metrics. The persist stage has a single worker and is the
+    only one touching the results, so they need no locking.
+    """
+
+    def __init__(self, status: AnalysisStatus, skip_quality_metrics: bool, metrics_writer: MetricsWriteBuffer):
+        self.logger = logging_util.get_logger(__name__)
+        self.status = status
+        self.skip_quality_metrics = skip_quality_metrics
+        self.metrics_writer = metrics_writer
+
+        self.experience_metrics = dict[str, CommitExperienceMetrics]()
+        self.quality_metrics = dict[str, CommitQualityMetrics]()
+        self.all_languages = set[str]()
+        self.all_frameworks = set[str]()
+        self.analyzed_commits = 0
+        # Scans submitted to the shared executor that haven't been handled yet
+        self.scans_in_flight = 0
+        self.scans_condition = threading.Condition()
+        # Commits whose metrics couldn't be computed; the result is partial while this isn't 0
+        self.failed_commits = 0
+        # Analyzed commits whose quality scan hasn't reported back
+        self.unscanned_commits = 0
+
+        self.persist_stage = PipelineStage("persist", self._persist, 1, Config.PIPELINE_QUEUE_SIZE)
+        # A single worker hands scans to the shared executor; its queue holds the rest back
+        self.quality_stage = PipelineStage("quality", self._scan_quality, 1, Config.PIPELINE_QUEUE_SIZE)
+        self.detect_stage = PipelineStage("detect", self._detect, Config.DETECT_WORKERS, Config.PIPELINE_QUEUE_SIZE)
+        # Fetched repositories waiting for extraction hold disk space, so only a few are fetched ahead
+        self.extract_stage = PipelineStage("extract", self._extract, Config.EXTRACT_WORKERS, Config.PIPELINE_PREFETCH_REPOS)
+        self.fetch_stage = PipelineStage("fetch", self._fetch, Config.FETCH_WORKERS, Config.PIPELINE_QUEUE_SIZE)
+
+    def run(self, repos: list[RepoDetails]):
+        """Runs every stage until all commits of the repositories have been handled."""
+        # Stages are closed upstream first, so each one drains before the next is told to stop
+        stages = [self.fetch_stage, self.extract_stage, self.detect_stage, self.quality_stage, self.persist_stage]
+        for stage in stages:
+            stage.start()
+        try:
+            self._discover(repos)
+        finally:
+            for stage in stages:
+                stage.close()
+                if stage is self.quality_stage:
+                    # Scans still running in the executor report to the persist stage
+                    with self.scans_condition:
+                        self.scans_condition.wait_for(lambda: self.scans_in_flight == 0)
+
+    def _discover(self, repos: list[RepoDetails]):
+        # Metrics already stored for any of the commits are loaded with a few bulk queries up front
+        commit_hashes = [commit.hash for repo in repos for commit in repo.commits]
+        cached_experience_metrics = db.find_commit_experience_metrics_many(commit_hashes)
+        cached_quality_metrics = db.find_commit_quality_metrics_many(commit_hashes) if not self.skip_quality_metrics else {}
+        # Commits analyzed before without producing metrics count as cached too
+        markers = db.find_commit_markers_many(commit_hashes, framework_detector.DETECTOR_VERSION)
+
+        for repo in repos:
+            pending_commits = list[CommitDetails]()
+            for commit in repo.commits:
+                reasons = markers.get(commit.hash, set())
+                if NO_LANGUAGES in reasons:
+                    self.persist_stage.put(SkippedCommit(commit.hash, NO_LANGUAGES))
+                    continue
+                commit_experience_metrics = cached_experience_metrics.get(commit.hash)
+                commit_quality_metrics = cached_quality_metrics.get(commit.hash)
+                quality_done = self.skip_quality_metrics or commit_quality_metrics is not None or QUALITY_UNAVAILABLE in reasons
+                if commit_experience_metrics is not None and quality_done:
+                    self.logger.info(f'found exisiting metrics for commit {commit.hash}')
+                    self.persist_stage.put(CachedCommit(commit.hash, commit_experience_metrics, commit_quality_metrics))
+                    continue
+                pending_commits.append(commit)
+
+            if len(pending_commits) > 0:
+                self.fetch_stage.put(RepoJob(repo=repo, pending_commits=pending_commits))
+
+    def _fetch(self, repo_job: RepoJob):
+        queued = False
+        try:
+            repo_job.repo_path = local_git_util.clone_repo(repo_job.repo.url)
+            if repo_job.repo_path is None:
+                self.logger.warning(f'Failed to clone repo {repo_job.repo.url}')
+                return
+            if Config.HUNK_IMPORT_DETECTION:
+                # Imports are carried forward from commit to commit, so the history is walked oldest first
+                repo_job.pending_commits.sort(key=lambda commit: commit.timestamp)
+                repo_job.import_tracker = HunkImportTracker(repo_job.repo_path)
+            # The extract stage holds the first reference until all batches are queued
+            repo_job.references = 1
+            self.extract_stage.put(repo_job)
+            queued = True
+        finally:
+            # Stage errors are only logged, so commits that won't reach the extract stage are reported here
+            if not queued:
+                for commit in repo_job.pending_commits:
+                    self.persist_stage.put(MissingCommit(commit.hash))
+                if repo_job.repo_path is not None:
+                    local_git_util.delete_repo(repo_job.repo_path)
+
+    def _extract(self, repo_job: RepoJob):
+        found_commits = set[str]()
+        try:
+            # All pending commits of the repo are diffed by a single git process, and skills are
+            # identified for batches of commits so framework scoring runs as one matrix product
+            # Worker processes read blob contents themselves, so they aren't loaded here
+            commits = local_git_util.iter_commits_details(
+                repo_job.repo_path,
+                repo_job.pending_commits,
+                with_hunks=repo_job.import_tracker is not None,
+                load_content=not skills_util.detects_in_processes
+            )
+            index = 0
+            while commit_batch := list(islice(commits, Config.SKILLS_BATCH_SIZE)):
+                found_commits.update(commit.hash for commit in commit_batch)
+                self._retain(repo_job)
+                self.detect_stage.put(CommitBatch(repo_job, index, commit_batch))
+                index += 1
+        finally:
+            for commit in repo_job.pending_commits:
+                if commit.hash not in found_commits:
+                    self.persist_stage.put(MissingCommit(commit.hash))
+            self._release(repo_job)
+
+    def _detect(self, batch: CommitBatch):
+        repo_job = batch.repo_job
+        analyzed_commits = set[str]()
+        try:
+            if repo_job.import_tracker is not None:
+                with repo_job.lock:
+                    repo_job.lock.wait_for(lambda: repo_job.next_batch == batch.index)
+            try:
+                results = skills_util.identify_skills_for_commits(batch.commits, repo_job.import_tracker, repo_job.repo_path)
+            finally:
+                with repo_job.lock:
+                    repo_job.next_batch = batch.index + 1
+                    repo_job.lock.notify_all()
+
+            for commit, languages, frameworks in results:
+                if len(languages) == 0:
+                    self.persist_stage.put(AnalyzedCommit(repo_job.repo.url, commit.hash, languages, frameworks, None))
+                    analyzed_commits.add(commit.hash)
+                    continue
+
+                excluded_files = skills_util.identify_excluded_files(commit)
+                commit_experience_metrics = metrics_util.get_experience_metrics(commit, excluded_files)
+                self.persist_stage.put(AnalyzedCommit(repo_job.repo.url, commit.hash, languages, frameworks, commit_experience_metrics))
+                analyzed_commits.add(commit.hash)
+                if not self.skip_quality_metrics:
+                    self._retain(repo_job)
+                    self.quality_stage.put(QualityTask(repo_job, commit, excluded_files))
+        finally:
+            for commit in batch.commits:
+                if commit.hash not in analyzed_commits:
+                    self.persist_stage.put(MissingCommit(commit.hash))
+            self._release(repo_job)
+
+    def _scan_quality(self, task: QualityTask):
+        repo_job = task.repo_job
+        # Caps the scans of one analysis, including those waiting on the server, so the
+        # executor isn't flooded and the stage queue holds the rest back
+        with self.scans_condition:
+            self.scans_condition.wait_for(lambda: self.scans_in_flight < Config.QUALITY_SCANS_IN_FLIGHT)
+            self.scans_in_flight += 1
+
+        worktree_pool, worktree_path = None, None
+        try:
+            with repo_job.lock:
+                # Experience metrics are read straight from the object database; worktrees are
+                # only created once quality scans need the files on disk
+                if repo_job.worktree_pool is None:
+                    repo_job.worktree_pool = WorktreePool(repo_job.repo_path, Config.QUALITY_WORKTREES_PER_REPO)
+                worktree_pool = repo_job.worktree_pool
+            # Taken before submitting, so executor threads never sit waiting for a worktree
+            worktree_path = worktree_pool.acquire()
+            if worktree_path is None:
+                self.logger.warning(f'Failed to create worktree for repo {repo_job.repo.url}')
+                self.persist_stage.put(ScannedCommit(repo_job.repo.url, task.commit.hash, None, scanned=False))
+                self._finish_scan(repo_job)
+                return
+            # The worktree goes back to the pool as soon as the scanner is done with it
+            future = quality_scan_executor.submit(
+                worktree_path,
+                task.commit,
+                task.excluded_files,
+                on_scanner_done=lambda: worktree_pool.release(worktree_path)
+            )
+        except BaseException:
+            if worktree_path is not None:
+                worktree_pool.release(worktree_path)
+            self.persist_stage.put(ScannedCommit(repo_job.repo.url, task.commit.hash, None, scanned=False))
+            self._finish_scan(repo_job)
+            raise
+        future.add_done_callback(lambda future: self._scanned(task, future))
+
+    def _scanned(self, task: QualityTask, future):
+        """Runs on an executor thread once a scan's metrics are in."""
+        repo_job = task.repo_job
+        try:
+            commit_quality_metrics = future.result()
+        except Exception as e:
+            self.logger.error(f'Error scanning commit {task.commit.hash} of {repo_job.repo.url}: {str(e)}', exc_info=True)
+            commit_quality_metrics = None
+        try:
+            self.persist_stage.put(ScannedCommit(repo_job.repo.url, task.commit.hash, commit_quality_metrics))
+        finally:
+            self._finish_scan(repo_job)
+
+    def _finish_scan(self, repo_job: RepoJob):
+        self._release(repo_job)
+        with self.scans_condition:
+            self.scans_in_flight -= 1
+            self.scans_condition.notify_all()
+
+    def _persist(self, item):
+        if isinstance(item, CachedCommit):
+            self._count_analyzed()
+            self.logger.info(f'Repo: {item.experience_metrics.repo_url}, commit: {item.commit_hash}, lines_of_code: {item.experience_metrics.lines_of_code}')
+            self.experience_metrics[item.commit_hash] = item.experience_metrics
+            if item.quality_metrics is not None:
+                self.logger.info(f'Repo: {item.experience_metrics.repo_url}, commit: {item.commit_hash}, quality metrics: {item.quality_metrics}')
+                self.quality_metrics[item.commit_hash] = item.quality_metrics
+        elif isinstance(item, AnalyzedCommit):
+            self._count_analyzed()
+            self.all_languages.update(item.languages)
+            self.all_frameworks.update(item.frameworks)
+            if item.experience_metrics is not None:
+                if not self.skip_quality_metrics:
+                    self.unscanned_commits += 1
+                self.experience_metrics[item.commit_hash] = item.experience_metrics
+                self.metrics_writer.save_commit_experience_metrics(item.repo_url, item.commit_hash, item.experience_metrics)
+                self.logger.info(f'Repo: {item.repo_url}, commit: {item.commit_hash}, lines_of_code: {item.experience_metrics.lines_of_code}')
+            else:
+                self.metrics_writer.save_commit_marker(CommitMarker(item.commit_hash, NO_LANGUAGES, framework_detector.DETECTOR_VERSION))
+        elif isinstance(item, SkippedCommit):
+            self._count_analyzed()
+            self.logger.info(f'Commit {item.commit_hash} was analyzed before with no metrics: {item.reason}')
+        elif isinstance(item, ScannedCommit):
+            self.unscanned_commits -= 1
+            self.logger.info(f'Repo: {item.repo_url}, commit: {item.commit_hash}, quality metrics: {item.quality_metrics}')
+            if item.quality_metrics is not None:
+                self.quality_metrics[item.commit_hash] = item.quality_metrics
+                self.metrics_writer.save_commit_quality_metrics(item.repo_url, item.commit_hash, item.quality_metrics)
+            else:
+                self.failed_commits += 1
+                if item.scanned:
+                    # The scan may succeed later, e.g. once the scanner is fixed, so it is retried eventually
+                    expires_at = datetime.utcnow() + timedelta(seconds=Config.QUALITY_RETRY_AFTER_SECONDS)
+                    marker = CommitMarker(item.commit_hash, QUALITY_UNAVAILABLE, framework_detector.DETECTOR_VERSION)
+                    self.metrics_writer.save_commit_marker(marker, expires_at)
+        elif isinstance(item, MissingCommit):
+            self._count_analyzed()
+            self.failed_commits += 1
+            self.logger.warning(f'failed to get commit details for commit {item.commit_hash}')
+
+    def accounts_for(self, total_commits: int) -> bool:
+        """
+        Whether each of the total_commits got metrics, reused stored ones or was recorded as failed,
+        with none failed. Commits lost to an unexpected error in a stage are missing from the counts.
+        """
+        return self.analyzed_commits == total_commits and self.unscanned_commits == 0 and self.failed_commits == 0
+
+    def _count_analyzed(self):
+        self.analyzed_commits += 1
+        self.status.analyzed_commits = self.analyzed_commits
+
+    def _retain(self, repo_job: RepoJob):
+        with repo_job.lock:
+            repo_job.references += 1
+
+    def _release(self, repo_job: RepoJob):
+        with repo_job.lock:
+            repo_job.references -= 1
+            if repo_job.references > 0:
+                return
+        if repo_job.worktree_pool is not None:
+            repo_job.worktree_pool.close()
+        local_git_util.delete_repo(repo_job.repo_path)
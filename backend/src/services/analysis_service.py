@@ -1,13 +1,16 @@
+import hashlib
 import uuid
-import threading
-from dataclasses import dataclass
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from typing import Optional
-from core.models import AnalysisStatus, CommitExperienceMetrics, ExperienceMetrics, OverallExperienceMetrics, OverallQualityMetrics, QualityMetrics
-from db import db
+from config import Config
+from core.models import AnalysisStatus, ExperienceMetrics, OverallExperienceMetrics, OverallQualityMetrics, QualityMetrics, RepoDetails, UserAnalysisResult
+from db import MetricsWriteBuffer, db
+from services.analysis_pipeline import AnalysisPipeline
+from services.job_scheduler import JobScheduler
 from utils.framework_detector import framework_detector
 from utils.metrics_util import metrics_util
-from utils.skills_util import skills_util
-from utils.local_git_util import local_git_util
 from utils.github_util import github_util
 from utils.logging_util import logging_util
 
@@ -20,36 +23,54 @@ class Submission:
     status: AnalysisStatus
     experience_metrics: Optional[ExperienceMetrics] = None
     quality_metrics: Optional[QualityMetrics] = None
+    # Resolved when the analysis finishes, whether it succeeded or not
+    completed: Future = field(default_factory=Future)
 
 
 class AnalysisService:
     def __init__(self):
         self.logger = logging_util.get_logger(__name__)
         self.submissions = {}
+        self.scheduler = JobScheduler(Config.ANALYSIS_WORKERS, Config.ANALYSIS_QUEUE_SIZE)
 
-    def submit_analysis(self, username: str, skip_quality_metrics: bool = False) -> tuple[Optional[str], Optional[str]]:
+    def submit_analysis(self, username: str, skip_quality_metrics: bool = False, priority: int = 0) -> tuple[Optional[str], Optional[str]]:
         analysis_id = str(uuid.uuid4())
         self.logger.info(f'Submitting analysis for {username} with ID {analysis_id}')
+        cached_result = self._find_fresh_result(username, skip_quality_metrics)
+        if cached_result is not None:
+            self.logger.info(f'Serving stored result for {username} analyzed at {cached_result.analyzed_at}')
+            self.submissions[analysis_id] = self._completed_submission(cached_result)
+            return analysis_id, cached_result.name
         user = github_util.get_user(username)
         if user is None:
             self.logger.error(f'Failed to get user for {username}')
             return None, None
         self.logger.info(f'Got user: {user}')
         name = user.name if user.name is not None else username
-        self.submissions[analysis_id] = Submission(
+        submission = Submission(
             username=username,
             name=name,
             skip_quality_metrics=skip_quality_metrics,
-            status=AnalysisStatus(total_commits=0, analyzed_commits=0, analysis_completed=False)
+            status=AnalysisStatus(total_commits=0, analyzed_commits=0, analysis_completed=False, priority=priority)
         )
-        
-        # Start analysis in a separate thread
-        thread = threading.Thread(
-            target=self._run_analysis,
-            args=(analysis_id, username, skip_quality_metrics)
+        self.submissions[analysis_id] = submission
+
+        # Analyses run on a bounded worker pool; a second submit for the same user and
+        # mode attaches to the analysis that is already queued or running
+        job = self.scheduler.submit(
+            job_id=analysis_id,
+            key=(username, skip_quality_metrics),
+            run=lambda: self._run_analysis(analysis_id, username, skip_quality_metrics),
+            priority=priority
         )
-        thread.daemon = True
-        thread.start()
+        if job is None or job.job_id != analysis_id:
+            del self.submissions[analysis_id]
+        if job is None:
+            self.logger.error(f'Analysis queue is full, rejected analysis for {username}')
+            return None, None
+        if job.job_id != analysis_id:
+            self.logger.info(f'Attached {username} to analysis {job.job_id}')
+            return job.job_id, self.submissions[job.job_id].name
         self.logger.info(f'Analysis submitted for {username} with id {analysis_id}')
         return analysis_id, name
     
@@ -65,11 +86,36 @@ class AnalysisService:
             self.logger.error(f"Error in analysis for {username}: {str(e)}", exc_info=True)
             # You might want to update status to indicate error
             self.submissions[analysis_id].status.analysis_completed = True
+        finally:
+            self.submissions[analysis_id].completed.set_result(None)
     
+    def _find_fresh_result(self, username: str, skip_quality_metrics: bool) -> Optional[UserAnalysisResult]:
+        """Returns the stored result of a user if it was checked against their commits recently enough to serve as is."""
+        result = db.find_user_result(username, skip_quality_metrics)
+        if result is None or result.detector_version != framework_detector.DETECTOR_VERSION:
+            return None
+        if datetime.utcnow() - result.analyzed_at > timedelta(seconds=Config.RESULT_CACHE_MAX_AGE_SECONDS):
+            return None
+        return result
+
+    def _completed_submission(self, result: UserAnalysisResult) -> Submission:
+        submission = Submission(
+            username=result.username,
+            name=result.name,
+            skip_quality_metrics=result.skip_quality_metrics,
+            status=AnalysisStatus(total_commits=result.commit_count, analyzed_commits=result.commit_count, analysis_completed=True),
+            experience_metrics=result.experience_metrics,
+            quality_metrics=result.quality_metrics
+        )
+        submission.completed.set_result(None)
+        return submission
+
     def get_status(self, analysis_id: Optional[str]) -> AnalysisStatus:
         if analysis_id is None or analysis_id not in self.submissions:
             return AnalysisStatus(total_commits=0, analyzed_commits=0, analysis_completed=True)
-        return self.submissions[analysis_id].status
+        status = self.submissions[analysis_id].status
+        status.queue_position = self.scheduler.queue_position(analysis_id)
+        return status
     
     def get_analysis(self, analysis_id: Optional[str]):
         if analysis_id is None or analysis_id not in self.submissions:
@@ -83,59 +129,30 @@ class AnalysisService:
         
         # Update total commits count
         total_commits = sum(len(repo.commits) for repo in repos)
-        self.submissions[analysis_id].status.total_commits = total_commits
-        
-        experience_metrics = {}
-        quality_metrics = {}
-        all_languages = set[str]()
-        all_frameworks = set[str]()
-        analyzed_commits = 0
-        
-        for repo in repos: 
-            repo_path = local_git_util.clone_repo(repo.url)
-            if repo_path is None:
-                self.logger.warning(f'Failed to clone repo {repo.url}')
-                continue
-            for commit in repo.commits:
-                analyzed_commits += 1
-                self.submissions[analysis_id].status.analyzed_commits = analyzed_commits
-                commit_experience_metrics = db.find_commit_experience_metrics(commit.hash)
-                commit_quality_metrics = db.find_commit_quality_metrics(commit.hash)
-                if commit_experience_metrics is not None and commit_quality_metrics is not None:
-                    self.logger.info(f'found exisiting metrics for commit {commit.hash}')
-                    self.logger.info(f'Repo: {repo.url}, commit: {commit.hash}, lines_of_code: {commit_experience_metrics.lines_of_code}')
-                    self.logger.info(f'Repo: {repo.url}, commit: {commit.hash}, quality metrics: {commit_quality_metrics}')
-                    experience_metrics.update({commit.hash: commit_experience_metrics})
-                    quality_metrics.update({commit.hash: commit_quality_metrics})
-                    continue
-                
-                local_git_util.checkout_commit(repo_path, commit.hash)
-                commit_details = local_git_util.get_commit_details(repo_path, commit.hash, commit)
-                if commit_details is None:
-                    self.logger.warning(f'failed to get commit details for commit {commit.hash}')
-                    continue
-                # print('\n\n',commit_details, '\n\n')
-                commit_details, languages, frameworks = skills_util.identify_skills(commit_details)
-                all_languages.update(languages)
-                all_frameworks.update(frameworks)
-                    
-                if len(languages) == 0:
-                    continue
-
-                excluded_files = skills_util.identify_excluded_files(commit_details)
-                # print('excluded_files', excluded_files)
-                commit_experience_metrics = metrics_util.get_experience_metrics(commit_details, excluded_files)
-                experience_metrics.update({commit.hash: commit_experience_metrics})
-                db.save_commit_experience_metrics(repo.url, commit.hash, commit_experience_metrics)
-                self.logger.info(f'Repo: {repo.url}, commit: {commit.hash}, lines_of_code: {commit_experience_metrics.lines_of_code}')
-                if not skip_quality_metrics:
-                    commit_quality_metrics = metrics_util.get_quality_metrics(commit_details, excluded_files, repo_path)
-                    quality_metrics.update({commit.hash: commit_quality_metrics})
-                    self.logger.info(f'Repo: {repo.url}, commit: {commit.hash}, quality metrics: {commit_quality_metrics}')
-                    if commit_quality_metrics is not None:
-                        db.save_commit_quality_metrics(repo.url, commit.hash, commit_quality_metrics)
-
-            local_git_util.delete_repo(repo_path)
+        submission = self.submissions[analysis_id]
+        submission.status.total_commits = total_commits
+
+        # An unchanged set of commits gives the same overall metrics as the stored ones
+        commit_fingerprint = self._commit_fingerprint(repos)
+        stored_result = db.find_user_result(username, skip_quality_metrics)
+        if (stored_result is not None
+                and stored_result.commit_fingerprint == commit_fingerprint
+                and stored_result.detector_version == framework_detector.DETECTOR_VERSION):
+            self.logger.info(f'No new commits for {username} since {stored_result.analyzed_at}, reusing the stored result')
+            db.touch_user_result(username, skip_quality_metrics, datetime.utcnow())
+            submission.status.analyzed_commits = total_commits
+            return stored_result.experience_metrics, stored_result.quality_metrics
+
+        # Only commits without stored metrics go through the pipeline; the overall metrics
+        # are then rolled up from the metrics of every commit
+        # Metrics are written behind in bulk; leaving the block flushes the rest, even if the analysis fails
+        with MetricsWriteBuffer(db, Config.METRICS_WRITE_BATCH_SIZE, Config.METRICS_WRITE_MAX_DELAY_SECONDS) as metrics_writer:
+            pipeline = AnalysisPipeline(submission.status, skip_quality_metrics, metrics_writer)
+            pipeline.run(repos)
+        experience_metrics = pipeline.experience_metrics
+        quality_metrics = pipeline.quality_metrics
+        all_languages = pipeline.all_languages
+        all_frameworks = pipeline.all_frameworks
 
         overall_experience_metrics = metrics_util.get_overall_experience_metrics(experience_metrics)
         if not skip_quality_metrics:
@@ -146,7 +163,24 @@ class AnalysisService:
         self.logger.info(f'All frameworks: {all_frameworks}')
         self.logger.info(f'Overall experience metrics: {overall_experience_metrics}')
         self.logger.info(f'Overall quality metrics: {overall_quality_metrics}')
+
+        db.save_user_result(UserAnalysisResult(
+            username=username,
+            name=submission.name,
+            skip_quality_metrics=skip_quality_metrics,
+            # A partial result is served while fresh but recomputed once it's stale
+            commit_fingerprint=commit_fingerprint if pipeline.accounts_for(total_commits) else None,
+            commit_count=total_commits,
+            detector_version=framework_detector.DETECTOR_VERSION,
+            experience_metrics=overall_experience_metrics,
+            quality_metrics=overall_quality_metrics,
+            analyzed_at=datetime.utcnow()
+        ))
         return overall_experience_metrics, overall_quality_metrics
 
+    def _commit_fingerprint(self, repos: list[RepoDetails]) -> str:
+        commit_hashes = sorted(commit.hash for repo in repos for commit in repo.commits)
+        return hashlib.sha256("\n".join(commit_hashes).encode()).hexdigest()
+
 
 analysis_service = AnalysisService()
\ No newline at end of file
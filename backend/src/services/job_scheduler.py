@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+from utils.logging_util import logging_util
+
+
+@dataclass
+class Job:
+    job_id: str
+    key: Hashable
+    priority: int
+    run: Callable[[], None]
+    running: bool = False
+    done: bool = False
+
+
+class JobScheduler:
+    """
+    Runs jobs on a fixed number of worker threads, fed from a bounded priority queue.
+
+    Jobs with a lower priority value run first; jobs with the same priority
+    run in submission order. Only one job per key is in flight at a time:
+    submitting a key that is queued or running returns the existing job.
+    """
+
+    def __init__(self, worker_count: int, max_queue_size: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.worker_count = worker_count
+        self.max_queue_size = max_queue_size
+        self._condition = threading.Condition()
+        self._queue = list[tuple[int, int, Job]]()
+        self._sequence = itertools.count()
+        self._in_flight = dict[Hashable, Job]()
+        self._workers = list[threading.Thread]()
+
+    def submit(self, job_id: str, key: Hashable, run: Callable[[], None], priority: int = 0) -> Optional[Job]:
+        """
+        Queues a job unless one with the same key is already queued or running.
+
+        Args:
+            job_id: Id of the new job.
+            key: Deduplication key.
+            run: The work to do; exceptions are logged by the worker.
+            priority: Lower values run first.
+
+        Returns:
+            The new job, the in-flight job with the same key, or None if the queue is full.
+        """
+        with self._condition:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self.logger.info(f"Job {existing.job_id} for {key} is already in flight")
+                return existing
+            if len(self._queue) >= self.max_queue_size:
+                self.logger.warning(f"Job queue is full ({self.max_queue_size}), rejecting job for {key}")
+                return None
+
+            job = Job(job_id=job_id, key=key, priority=priority, run=run)
+            heapq.heappush(self._queue, (priority, next(self._sequence), job))
+            self._in_flight[key] = job
+            self._start_workers()
+            self._condition.notify()
+            return job
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Returns how many queued jobs run before this one, or None if it isn't queued."""
+        with self._condition:
+            ordered = sorted(self._queue)
+            for position, (_, _, job) in enumerate(ordered):
+                if job.job_id == job_id:
+                    return position
+        return None
+
+    def _start_workers(self):
+        # Workers are started lazily, so importing the scheduler doesn't spawn threads
+        while len(self._workers) < self.worker_count:
+            worker = threading.Thread(target=self._work, name=f"analysis-worker-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _, _, job = heapq.heappop(self._queue)
+                job.running = True
+
+            try:
+                job.run()
+            except Exception as e:
+                self.logger.error(f"Error in job {job.job_id}: {str(e)}", exc_info=True)
+            finally:
+                with self._condition:
+                    job.running = False
+                    job.done = True
+                    self._in_flight.pop(job.key, None)
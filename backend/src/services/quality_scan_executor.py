@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from config import Config
+from core.models import CommitDetails, FileInfo
+from utils.ce_task_waiter import ce_task_waiter
+from utils.local_git_util import local_git_util
+from utils.logging_util import logging_util
+from utils.metrics_util import metrics_util
+from utils.quality_scan import quality_scan
+
+
+class WorktreePool:
+    """
+    Worktrees of one repository mirror, each handed out to one scan at a time.
+
+    Worktrees are created on demand up to max_worktrees; after that acquire
+    waits for a scan to give one back. They are kept until close is called,
+    so later commits only need a checkout.
+    """
+
+    def __init__(self, repo_path: str, max_worktrees: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.repo_path = repo_path
+        self.max_worktrees = max(1, max_worktrees)
+        self._condition = threading.Condition()
+        self._idle = list[str]()
+        self._created = 0
+
+    def acquire(self) -> Optional[str]:
+        """Returns a worktree that no other scan is using, or None if one couldn't be created."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._idle or self._created < self.max_worktrees)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        worktree_path = local_git_util.create_worktree(self.repo_path)
+        if worktree_path is None:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+        return worktree_path
+
+    def release(self, worktree_path: str):
+        with self._condition:
+            self._idle.append(worktree_path)
+            self._condition.notify()
+
+    def close(self):
+        """Deletes the worktrees. Every acquired worktree must have been released."""
+        with self._condition:
+            worktree_paths, self._idle = self._idle, []
+            self._created = 0
+        for worktree_path in worktree_paths:
+            local_git_util.delete_worktree(worktree_path)
+
+
+class QualityScanExecutor:
+    """
+    Runs quality scans on a pool of threads shared by all analyses.
+
+    A thread is only held while the scanner process runs and while the
+    measures are fetched. Waiting for the server to process the report is
+    left to ce_task_waiter, so the pool size caps how many scanner processes
+    run across all analyses together and the server can work on reports in
+    the meantime.
+    """
+
+    def __init__(self, max_concurrent_scans: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.max_concurrent_scans = max(1, max_concurrent_scans)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, worktree_path: str, commit: CommitDetails, excluded_files: list[FileInfo], on_scanner_done: Callable[[], None]) -> Future:
+        """
+        Checks out the commit in the worktree and scans it.
+
+        on_scanner_done is called once the worktree isn't needed anymore, which is
+        before the server has processed the report. The returned future resolves
+        to the commit's quality metrics, or None if the scan failed.
+        """
+        result = Future()
+        self._get_executor().submit(self._start_scan, worktree_path, commit, excluded_files, on_scanner_done, result)
+        return result
+
+    def _start_scan(self, worktree_path: str, commit: CommitDetails, excluded_files: list[FileInfo], on_scanner_done: Callable[[], None], result: Future):
+        try:
+            try:
+                inclusions = metrics_util.get_scan_inclusions(commit, excluded_files)
+                task_id, error = None, None
+                # An empty inclusion list would make the scanner scan everything
+                if inclusions is None or len(inclusions) > 0:
+                    local_git_util.checkout_commit(worktree_path, commit.hash)
+                    task_id, error = quality_scan.start_scan(commit.hash, worktree_path, inclusions)
+            finally:
+                on_scanner_done()
+            if error:
+                self.logger.error(error)
+                result.set_result(None)
+                return
+            if task_id is None:
+                result.set_result(metrics_util.collect_quality_metrics(commit, scanned=False))
+                return
+            ce_task_waiter.wait(task_id).add_done_callback(
+                lambda task_done: self._get_executor().submit(self._collect, commit, task_done, result)
+            )
+        except Exception as e:
+            result.set_exception(e)
+
+    def _collect(self, commit: CommitDetails, task_done: Future, result: Future):
+        try:
+            if not task_done.result():
+                self.logger.info(f"Analysis of commit {commit.hash} failed or results not available")
+                result.set_result(None)
+                return
+            result.set_result(metrics_util.collect_quality_metrics(commit))
+        except Exception as e:
+            result.set_exception(e)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads are only started once the first scan is submitted
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_scans, thread_name_prefix="quality-scan")
+            return self._executor
+
+
+quality_scan_executor = QualityScanExecutor(Config.QUALITY_SCAN_CONCURRENCY)
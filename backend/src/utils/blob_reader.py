@@ -0,0 +1,139 @@
+import subprocess
+import threading
+from dataclasses import dataclass
+from utils.logging_util import logging_util
+
+# Read size used while streaming blob content off the cat-file pipe
+READ_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class BlobContent:
+    sha: str
+    size: int
+    data: bytes
+    truncated: bool
+    line_count: int
+
+
+class BlobReader:
+    """
+    A long-lived `git cat-file --batch` process for one repository.
+
+    Blobs are streamed off the pipe in chunks; only the first max_bytes of
+    each blob are kept in memory and the rest is counted and discarded.
+    """
+
+    def __init__(self, repo_path: str):
+        self.logger = logging_util.get_logger(__name__)
+        self.repo_path = repo_path
+        self._lock = threading.Lock()
+        self._process = self._start()
+
+    def _start(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=self.repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, blob_sha: str, max_bytes: int) -> BlobContent | None:
+        """
+        Reads a blob from the object database.
+
+        Args:
+            blob_sha: The blob id.
+            max_bytes: Maximum number of content bytes to keep.
+
+        Returns:
+            BlobContent with at most max_bytes of data, or None if the object is missing.
+        """
+        with self._lock:
+            try:
+                return self._read(blob_sha, max_bytes)
+            except (BrokenPipeError, EOFError, ValueError) as e:
+                # The process died or the stream got out of sync; restart it for the next read
+                self.logger.error(f"Error reading blob {blob_sha} from {self.repo_path}: {e}")
+                self._stop()
+                self._process = self._start()
+                return None
+
+    def _read(self, blob_sha: str, max_bytes: int) -> BlobContent | None:
+        stdin = self._process.stdin
+        stdout = self._process.stdout
+        stdin.write(f"{blob_sha}\n".encode())
+        stdin.flush()
+
+        header = stdout.readline()
+        if not header:
+            raise EOFError("cat-file exited")
+        if header.endswith(b" missing\n"):
+            return None
+        _, object_type, size = header.split()
+        size = int(size)
+
+        kept = list[bytes]()
+        kept_bytes = 0
+        line_count = 0
+        remaining = size
+        while remaining > 0:
+            chunk = stdout.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise EOFError("cat-file exited mid-object")
+            remaining -= len(chunk)
+            line_count += chunk.count(b"\n")
+            if kept_bytes < max_bytes:
+                chunk = chunk[:max_bytes - kept_bytes]
+                kept.append(chunk)
+                kept_bytes += len(chunk)
+        # Every object is followed by a newline
+        stdout.read(1)
+
+        if object_type != b"blob":
+            return None
+        return BlobContent(
+            sha=blob_sha,
+            size=size,
+            data=b"".join(kept),
+            truncated=kept_bytes < size,
+            line_count=line_count,
+        )
+
+    def _stop(self):
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.kill()
+        self._process.wait()
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+
+class BlobReaderPool:
+    """Keeps one persistent BlobReader per repository path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readers = dict[str, BlobReader]()
+
+    def get(self, repo_path: str) -> BlobReader:
+        with self._lock:
+            reader = self._readers.get(repo_path)
+            if reader is None:
+                reader = BlobReader(repo_path)
+                self._readers[repo_path] = reader
+            return reader
+
+    def close(self, repo_path: str):
+        with self._lock:
+            reader = self._readers.pop(repo_path, None)
+        if reader is not None:
+            reader.close()
+
+
+blob_reader_pool = BlobReaderPool()
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import requests
+from config import Config
+from utils.http_sessions import http_sessions
+from utils.logging_util import logging_util
+
+FINAL_STATUSES = {"SUCCESS", "FAILED", "CANCELED"}
+# Poll intervals grow by this factor while no task finishes
+BACKOFF_FACTOR = 1.5
+# Poll intervals are randomized by this fraction so scans started together don't poll in lockstep
+JITTER = 0.2
+# The activity endpoint filters on the server's submit time, which is earlier than ours
+SUBMITTED_AT_MARGIN = timedelta(minutes=5)
+ACTIVITY_PAGE_SIZE = 1000
+MAX_ACTIVITY_PAGES = 5
+
+
+@dataclass
+class PendingTask:
+    future: Future
+    submitted_at: datetime
+    deadline: float
+
+
+class CeTaskWaiter:
+    """
+    Waits for SonarQube Compute Engine tasks on a single background thread.
+
+    wait returns a future instead of blocking, so the caller's thread is free
+    while the server processes the report. All pending tasks are checked with
+    one `/api/ce/activity` request per poll; servers that don't allow it (the
+    endpoint needs admin rights) are polled per task through `/api/ce/task`,
+    as are tasks missing from a listing cut off after MAX_ACTIVITY_PAGES.
+    The poll interval backs off exponentially with jitter while nothing
+    finishes and starts over when a new task comes in.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, timeout_seconds: float):
+        self.logger = logging_util.get_logger(__name__)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.timeout_seconds = timeout_seconds
+        self._condition = threading.Condition()
+        self._pending = dict[str, PendingTask]()
+        self._interval = min_interval
+        self._use_activity = True
+        self._thread = None
+
+    def wait(self, task_id: str) -> Future:
+        """Returns a future that resolves to True once the task succeeded, or False if it failed or timed out."""
+        future = Future()
+        with self._condition:
+            self._pending[task_id] = PendingTask(
+                future=future,
+                submitted_at=datetime.now(timezone.utc),
+                deadline=time.monotonic() + self.timeout_seconds
+            )
+            self._interval = self.min_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ce-task-waiter", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._pending) > 0)
+                interval = self._interval
+            time.sleep(interval * random.uniform(1 - JITTER, 1 + JITTER))
+
+            with self._condition:
+                pending = dict(self._pending)
+            try:
+                statuses = self._poll(pending)
+            except Exception as e:
+                self.logger.error(f"Error polling {len(pending)} analysis tasks: {str(e)}", exc_info=True)
+                statuses = {}
+
+            finished = 0
+            now = time.monotonic()
+            for task_id, task in pending.items():
+                status = statuses.get(task_id)
+                if status in FINAL_STATUSES:
+                    if status != "SUCCESS":
+                        self.logger.error(f"Analysis task {task_id} finished with status: {status}")
+                    self._resolve(task_id, status == "SUCCESS")
+                    finished += 1
+                elif now > task.deadline:
+                    self.logger.error(f"Analysis task {task_id} did not finish within {self.timeout_seconds}s, last status: {status}")
+                    self._resolve(task_id, False)
+
+            with self._condition:
+                if finished > 0:
+                    self._interval = self.min_interval
+                elif self._interval == interval:
+                    self._interval = min(interval * BACKOFF_FACTOR, self.max_interval)
+
+    def _resolve(self, task_id: str, success: bool):
+        with self._condition:
+            task = self._pending.pop(task_id, None)
+        if task is not None:
+            task.future.set_result(success)
+
+    def _poll(self, pending: dict[str, PendingTask]) -> dict[str, str]:
+        """Returns the current status of the pending tasks that could be looked up."""
+        if self._use_activity and len(pending) > 1:
+            statuses = self._poll_activity(pending)
+            if statuses is not None:
+                return statuses
+        statuses = {}
+        for task_id in pending:
+            status = self._poll_task(task_id)
+            if status is not None:
+                statuses[task_id] = status
+        return statuses
+
+    def _poll_activity(self, pending: dict[str, PendingTask]) -> Optional[dict[str, str]]:
+        """Looks up finished tasks in bulk; returns None if the activity endpoint can't be used."""
+        min_submitted_at = min(task.submitted_at for task in pending.values()) - SUBMITTED_AT_MARGIN
+        statuses = {}
+        for page in range(1, MAX_ACTIVITY_PAGES + 1):
+            response = http_sessions.get(
+                f"{Config.SONARQUBE_URL}/api/ce/activity",
+                params={
+                    "status": ",".join(sorted(FINAL_STATUSES)),
+                    "minSubmittedAt": min_submitted_at.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "ps": ACTIVITY_PAGE_SIZE,
+                    "p": page,
+                },
+                headers=self._headers()
+            )
+            if response.status_code in (400, 401, 403, 404):
+                self.logger.warning(f"Can't list analysis tasks ({response.status_code}), polling them one by one")
+                self._use_activity = False
+                return None
+            if response.status_code != 200:
+                self.logger.warning(f"Listing analysis tasks failed with {response.status_code}")
+                return statuses
+            tasks = response.json().get("tasks", [])
+            for task in tasks:
+                if task["id"] in pending:
+                    statuses[task["id"]] = task["status"]
+            if len(statuses) == len(pending) or len(tasks) < ACTIVITY_PAGE_SIZE:
+                return statuses
+
+        # More tasks finished than the pages read hold, so the missing ones may be among them;
+        # they are looked up one by one instead of waiting until they time out
+        for task_id in pending:
+            if task_id not in statuses:
+                status = self._poll_task(task_id)
+                if status is not None:
+                    statuses[task_id] = status
+        return statuses
+
+    def _poll_task(self, task_id: str) -> Optional[str]:
+        try:
+            response = http_sessions.get(
+                f"{Config.SONARQUBE_URL}/api/ce/task",
+                params={"id": task_id},
+                headers=self._headers()
+            )
+        except requests.RequestException as e:
+            self.logger.warning(f"Error checking analysis task {task_id}: {str(e)}")
+            return None
+        if response.status_code != 200:
+            self.logger.warning(f"Checking analysis task {task_id} failed with {response.status_code}")
+            return None
+        return response.json()["task"]["status"]
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {Config.SONAR_CLOUD_TOKEN if Config.SONAR_CLOUD_TOKEN else Config.SONARQUBE_TOKEN}"
+        }
+
+
+ce_task_waiter = CeTaskWaiter(
+    Config.SONAR_TASK_POLL_MIN_SECONDS,
+    Config.SONAR_TASK_POLL_MAX_SECONDS,
+    Config.SONAR_TASK_TIMEOUT_SECONDS
+)
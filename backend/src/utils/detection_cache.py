@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from pymongo.errors import PyMongoError
+from config import Config
+from core.models import BlobDetection
+from db import db
+from utils.logging_util import logging_util
+
+DetectionKey = tuple[str, str]
+
+
+class DetectionCache:
+    """
+    Caches language, import and framework detection per git blob.
+
+    Identical file contents share a blob id across forks, cherry-picks and
+    reverts, so detection only has to run once per unique blob. The file
+    extension is part of the key because the language comes from the path.
+    Lookups go to an in-process LRU first and then, if enabled, to MongoDB.
+
+    Results depend on how much of each blob is read and scanned, so entries
+    are stored under a version that combines the detector version with
+    content_mode, and a change of either setting misses the old entries.
+    """
+
+    def __init__(self, max_entries: int, persist: bool, content_mode: str):
+        self.logger = logging_util.get_logger(__name__)
+        self.max_entries = max_entries
+        self.persist = persist
+        self.content_mode = content_mode
+        self._lock = threading.Lock()
+        self._entries = OrderedDict[DetectionKey, BlobDetection]()
+
+    def version(self, detector_version: str) -> str:
+        """The version detections made with detector_version are stored and looked up under."""
+        return f"{detector_version}:{self.content_mode}"
+
+    def get_many(self, keys: list[DetectionKey], detector_version: str) -> dict[DetectionKey, BlobDetection]:
+        found = dict[DetectionKey, BlobDetection]()
+        with self._lock:
+            for key in keys:
+                detection = self._entries.get(key)
+                if detection is not None and detection.detector_version == detector_version:
+                    self._entries.move_to_end(key)
+                    found[key] = detection
+
+        missing = [key for key in keys if key not in found]
+        if self.persist and missing:
+            try:
+                stored = db.find_blob_detections(missing, detector_version)
+            except PyMongoError as e:
+                self.logger.warning(f"Error reading blob detections: {e}")
+                stored = {}
+            self._remember(stored.values())
+            found.update(stored)
+        return found
+
+    def put_many(self, detections: list[BlobDetection]):
+        self._remember(detections)
+        if self.persist and detections:
+            try:
+                db.save_blob_detections(detections)
+            except PyMongoError as e:
+                # Another worker may have stored the same blob concurrently
+                self.logger.warning(f"Error saving blob detections: {e}")
+
+    def _remember(self, detections):
+        with self._lock:
+            for detection in detections:
+                key = (detection.blob_sha, detection.file_extension)
+                self._entries[key] = detection
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _content_mode() -> str:
+    read_mode = f"header{Config.BLOB_HEADER_BYTES}" if Config.BLOB_HEADER_ONLY else f"max{Config.BLOB_MAX_BYTES}"
+    scan_mode = "early-exit" if Config.IMPORT_SCAN_EARLY_EXIT else "full-scan"
+    return f"{read_mode}:{scan_mode}"
+
+
+detection_cache = DetectionCache(Config.DETECTION_CACHE_SIZE, Config.DETECTION_CACHE_PERSIST, _content_mode())
@@ -0,0 +1,71 @@
+"""
+Skill detection entry points for worker processes.
+
+This module deliberately imports nothing that touches the database or the
+services, so a spawned worker only loads the framework detector. Workers are
+sent blob ids instead of file contents and read the blobs from the
+repository themselves.
+"""
+from collections import OrderedDict
+from config import Config
+from core.models import FileInfo
+from utils.blob_reader import BlobReader
+from utils.framework_detector import framework_detector
+
+# Repositories a worker keeps a `git cat-file` process open for
+MAX_OPEN_READERS = 4
+
+_readers = OrderedDict[str, BlobReader]()
+
+
+def init_worker():
+    """Runs once per worker process so the framework index is built before the first task."""
+    framework_detector.score_imports(set())
+
+
+def detect_blobs(repo_path: str, blobs: list[tuple[str, str, str]], reader: BlobReader | None = None) -> list[tuple[list[str], list[str]]]:
+    """
+    Finds the imports and frameworks of blobs in a repository.
+
+    Args:
+        repo_path: Path of the repository the blobs are read from.
+        blobs: (blob_sha, file_extension, language) per blob.
+        reader: Reader for the repository, owned by the caller. Worker processes
+            leave it unset and use a reader they keep open for the repository.
+
+    Returns:
+        (sorted imports, frameworks) per blob, in the same order.
+    """
+    if reader is None:
+        reader = _get_reader(repo_path)
+    max_bytes = Config.BLOB_HEADER_BYTES if Config.BLOB_HEADER_ONLY else Config.BLOB_MAX_BYTES
+    file_infos = []
+    for blob_sha, file_extension, language in blobs:
+        blob = reader.read(blob_sha, max_bytes)
+        file_infos.append(FileInfo(
+            file_path="",
+            file_extension=file_extension,
+            line_count=0,
+            char_count=0,
+            additions=0,
+            deletions=0,
+            language=language,
+            content=blob.data.decode('utf-8', errors='ignore') if blob is not None else "",
+            blob_sha=blob_sha
+        ))
+
+    imports_list = [framework_detector.find_imports(file_info) for file_info in file_infos]
+    frameworks_list = framework_detector.detect_frameworks_batch(file_infos, imports_list)
+    return [(sorted(imports), frameworks) for imports, frameworks in zip(imports_list, frameworks_list)]
+
+
+def _get_reader(repo_path: str) -> BlobReader:
+    reader = _readers.get(repo_path)
+    if reader is None:
+        reader = BlobReader(repo_path)
+        _readers[repo_path] = reader
+    _readers.move_to_end(repo_path)
+    while len(_readers) > MAX_OPEN_READERS:
+        _, oldest = _readers.popitem(last=False)
+        oldest.close()
+    return reader
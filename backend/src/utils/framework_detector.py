@@ -1,10 +1,9 @@
+import math
 import re
-from dataclasses import dataclass
 from typing import Dict, List, Optional, Set
-import os
 from collections import defaultdict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from scipy.sparse import csr_matrix
 from utils.import_detector import import_detector
 from utils.logging_util import logging_util
 from core.models import FileInfo
@@ -169,6 +168,9 @@ class FileInfoFrameworkDetector:
         ]
     }
     
+    # Bump whenever detection logic or FRAMEWORK_IMPORTS change, so cached detections are recomputed
+    DETECTOR_VERSION = "2"
+    
     # Framework-specific import patterns
     FRAMEWORK_IMPORTS = {
         # JavaScript/TypeScript
@@ -237,8 +239,14 @@ class FileInfoFrameworkDetector:
 
     }
     
+    # Token pattern of the TF-IDF vocabulary built from FRAMEWORK_IMPORTS
+    TOKEN_PATTERN = re.compile(r'[a-zA-Z0-9_\-./]+')
+    
+    # Minimum cosine similarity for a framework to be reported
+    SIMILARITY_THRESHOLD = 0.1
+    
     def __init__(self):
-        """Initialize the framework detector with TF-IDF vectorizer."""
+        """Initialize the framework detector with a precompiled TF-IDF import index."""
         self.logger = logging_util.get_logger(__name__)
         # Prepare corpus for TF-IDF
         self.framework_docs = {}
@@ -247,17 +255,103 @@ class FileInfoFrameworkDetector:
         for framework, imports in self.FRAMEWORK_IMPORTS.items():
             self.framework_docs[framework] = " ".join(imports)
         
-        # Create TF-IDF vectorizer
-        self.vectorizer = TfidfVectorizer(analyzer='word', 
-                                         token_pattern=r'[a-zA-Z0-9_\-./]+',
-                                         min_df=1)
+        # Get framework names in the same order as the index weights
+        self.framework_names = list(self.framework_docs.keys())
         
-        # Fit the vectorizer with framework documents
-        corpus = list(self.framework_docs.values())
-        self.tfidf_matrix = self.vectorizer.fit_transform(corpus)
+        # Compile the corpus into token -> [(framework index, weight)]
+        self.idf, self.import_index = self._build_import_index(list(self.framework_docs.values()))
+        
+        # Same weights as a sparse (token x framework) matrix, for scoring many files in one product
+        self.token_ids = {token: token_id for token_id, token in enumerate(sorted(self.idf))}
+        rows, cols, data = [], [], []
+        for token, postings in self.import_index.items():
+            for doc_index, weight in postings:
+                rows.append(self.token_ids[token])
+                cols.append(doc_index)
+                data.append(weight)
+        self.framework_matrix = csr_matrix(
+            (data, (rows, cols)),
+            shape=(len(self.token_ids), len(self.framework_names))
+        )
+    
+    def _tokenize(self, doc: str) -> List[str]:
+        return self.TOKEN_PATTERN.findall(doc.lower())
+    
+    def _build_import_index(self, corpus: List[str]) -> tuple[Dict[str, float], Dict[str, List[tuple[int, float]]]]:
+        """
+        Compile the framework documents into an inverted index.
         
-        # Get framework names in the same order as the matrix
-        self.framework_names = list(self.framework_docs.keys())
+        Weights are the L2-normalised TF-IDF values that sklearn's TfidfVectorizer
+        (lowercase, smooth idf, same token pattern) assigns, so scoring a file
+        needs only dictionary lookups and yields the same cosine similarities.
+        
+        Args:
+            corpus: One document of space separated imports per framework
+            
+        Returns:
+            Tuple of (idf per token, inverted index of token to framework weights)
+        """
+        term_counts = [defaultdict(int) for _ in corpus]
+        document_frequency = defaultdict(int)
+        for doc_index, doc in enumerate(corpus):
+            for token in self._tokenize(doc):
+                term_counts[doc_index][token] += 1
+            for token in term_counts[doc_index]:
+                document_frequency[token] += 1
+        
+        doc_count = len(corpus)
+        idf = {
+            token: math.log((1 + doc_count) / (1 + frequency)) + 1
+            for token, frequency in document_frequency.items()
+        }
+        
+        import_index = defaultdict(list)
+        for doc_index, counts in enumerate(term_counts):
+            weights = self._normalized_weights(counts, idf)
+            for token, weight in weights.items():
+                import_index[token].append((doc_index, weight))
+        
+        return idf, dict(import_index)
+    
+    def _normalized_weights(self, counts: Dict[str, int], idf: Dict[str, float]) -> Dict[str, float]:
+        """
+        L2-normalised TF-IDF weights of a document, in vocabulary order.
+        
+        sklearn normalises once in TfidfVectorizer and again in cosine_similarity,
+        summing in vocabulary order; doing the same keeps scores bit-identical,
+        which matters for files that land exactly on the threshold.
+        """
+        weights = {token: counts[token] * idf[token] for token in sorted(counts)}
+        for _ in range(2):
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            weights = {token: weight / norm for token, weight in weights.items()}
+        return weights
+    
+    def score_imports(self, imports: Set[str]) -> List[float]:
+        """
+        Compute the cosine similarity of a set of imports with every framework.
+        
+        Args:
+            imports: Imported module names
+            
+        Returns:
+            Similarity per framework, in framework_names order
+        """
+        similarities = [0.0] * len(self.framework_names)
+        for token, weight in self._import_weights(imports).items():
+            for doc_index, doc_weight in self.import_index[token]:
+                similarities[doc_index] += weight * doc_weight
+        return similarities
+    
+    def _import_weights(self, imports: Set[str]) -> Dict[str, float]:
+        """TF-IDF vector of the import document, restricted to the known vocabulary."""
+        counts = defaultdict(int)
+        for token in self._tokenize(" ".join(imports)):
+            if token in self.idf:
+                counts[token] += 1
+        if not counts:
+            return {}
+        return self._normalized_weights(counts, self.idf)
     
     def detect_language(self, file_info: FileInfo) -> str:
         """
@@ -326,12 +420,27 @@ class FileInfoFrameworkDetector:
         
         return imports
     
-    def detect_frameworks(self, file_info: FileInfo) -> List[str]:
+    def find_imports(self, file_info: FileInfo) -> Set[str]:
+        """
+        Find the modules imported by a file, using the language set on the FileInfo.
+        
+        Args:
+            file_info: FileInfo object with content and language
+            
+        Returns:
+            Set of imported module names
+        """
+        if not file_info.content:
+            return set()
+        return import_detector.find_imports_for_language(file_info.content, file_info.language)
+    
+    def detect_frameworks(self, file_info: FileInfo, imports: Optional[Set[str]] = None) -> List[str]:
         """
         Detect frameworks used in a file based on import statements.
         
         Args:
             file_info: FileInfo object
+            imports: Imports already found by find_imports, if available
             
         Returns:
             List of detected frameworks
@@ -341,29 +450,70 @@ class FileInfoFrameworkDetector:
             return []
         
         # Extract imports from file content
-        imports = import_detector.find_imports_for_language(file_info.content, file_info.language)
+        if imports is None:
+            imports = self.find_imports(file_info)
 
         if not imports:
             return []
         
-        # Create a document from the imports
-        import_doc = " ".join(imports)
-        
-        # Transform the import document to TF-IDF vector
-        import_vector = self.vectorizer.transform([import_doc])
-        
         # Calculate cosine similarity with each framework
-        similarities = cosine_similarity(import_vector, self.tfidf_matrix)[0]
+        similarities = self.score_imports(imports)
         
         # Get frameworks with similarity above threshold
-        threshold = 0.1
         frameworks = [
             self.framework_names[i]
             for i in range(len(self.framework_names))
-            if similarities[i] > threshold
+            if similarities[i] > self.SIMILARITY_THRESHOLD
         ]
         
-        # Add special case detection based on file content patterns
+        return self._add_content_frameworks(file_info, frameworks)
+    
+    def detect_frameworks_batch(self, file_infos: List[FileInfo], imports_list: Optional[List[Set[str]]] = None) -> List[List[str]]:
+        """
+        Detect frameworks for many files at once.
+        
+        All import documents are stacked into one sparse matrix and scored
+        against every framework with a single matrix product, so the per-file
+        cost is just building its row. Results match detect_frameworks.
+        
+        Args:
+            file_infos: FileInfo objects, e.g. every file of a commit or repository
+            imports_list: Imports already found by find_imports, in the same order, if available
+            
+        Returns:
+            List of detected frameworks per file, in the same order
+        """
+        if imports_list is None:
+            imports_list = [self.find_imports(file_info) for file_info in file_infos]
+        
+        indptr, indices, data = [0], [], []
+        for file_info, imports in zip(file_infos, imports_list):
+            if file_info.content and imports:
+                for token, weight in self._import_weights(imports).items():
+                    indices.append(self.token_ids[token])
+                    data.append(weight)
+            indptr.append(len(indices))
+        
+        import_matrix = csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(file_infos), len(self.token_ids))
+        )
+        similarities = (import_matrix @ self.framework_matrix).toarray()
+        
+        results = []
+        for row, (file_info, imports) in enumerate(zip(file_infos, imports_list)):
+            if not file_info.content or not imports:
+                results.append([])
+                continue
+            frameworks = [
+                self.framework_names[i]
+                for i in np.flatnonzero(similarities[row] > self.SIMILARITY_THRESHOLD)
+            ]
+            results.append(self._add_content_frameworks(file_info, frameworks))
+        return results
+    
+    def _add_content_frameworks(self, file_info: FileInfo, frameworks: List[str]) -> List[str]:
+        """Add special case detection based on file content patterns."""
         lang = self.detect_language(file_info)
         content = file_info.content.lower()
         
@@ -425,6 +575,7 @@ def process_files(file_infos: List[FileInfo]) -> List[FileInfo]:
     
     return file_infos
 
+
 framework_detector = FileInfoFrameworkDetector()
 
 # Example of how to use this code
@@ -519,4 +670,4 @@ if __name__ == "__main__":
         print(f"File: {file.file_path}")
         print(f"Language: {file.language}")
         print(f"Frameworks: {file.frameworks}")
-        print("---")
\ No newline at end of file
+        print("---")
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+import httpx
+from utils.http_cache import HttpResponseCache
+from utils.logging_util import logging_util
+
+# The search API returns at most this many results for a query
+SEARCH_RESULT_LIMIT = 1000
+SEARCH_PAGE_SIZE = 100
+# Queries made per discovery when there are more results than one query returns
+MAX_SEARCH_WINDOWS = 20
+MAX_RETRIES = 3
+# Extra wait after a rate limit window resets, to allow for clock skew
+RESET_MARGIN_SECONDS = 1.0
+
+
+@dataclass
+class DiscoveredCommit:
+    sha: str
+    message: str
+    timestamp: datetime
+    parent_count: int
+    repo_full_name: str
+    repo_name: str
+    repo_api_url: str
+
+
+@dataclass
+class DiscoveryResult:
+    commits: list[DiscoveredCommit]
+    # False when a result page couldn't be fetched or there were more results than could be
+    # searched for, so some commits may be missing
+    complete: bool
+
+
+class RateLimitScheduler:
+    """
+    Paces requests from the `X-RateLimit-*` headers of earlier responses.
+
+    Once the remaining budget is used up, requests wait for the window to
+    reset instead of failing, and concurrent requests never spend more than
+    what is left.
+    """
+
+    def __init__(self):
+        self.logger = logging_util.get_logger(__name__)
+        self._lock = asyncio.Lock()
+        self._remaining: Optional[int] = None
+        self._reset_at = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            if self._remaining is not None and self._remaining <= 0:
+                delay = self._reset_at - time.time() + RESET_MARGIN_SECONDS
+                if delay > 0:
+                    # Sleeping with the lock held holds back every other request too
+                    self.logger.info(f"GitHub rate limit used up, waiting {delay:.1f}s for the reset")
+                    await asyncio.sleep(delay)
+                self._remaining = None
+            if self._remaining is not None:
+                self._remaining -= 1
+
+    def update(self, response: httpx.Response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining, reset_at = int(remaining), float(reset)
+        # Responses can arrive out of order; within one window the lowest count is the latest
+        if reset_at == self._reset_at and self._remaining is not None:
+            remaining = min(remaining, self._remaining)
+        self._remaining = remaining
+        self._reset_at = reset_at
+
+    def retry_delay(self, response: httpx.Response) -> Optional[float]:
+        """Returns how long to wait before retrying a rate limited response, or None if it wasn't rate limited."""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            return float(retry_after)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            return max(0.0, float(response.headers.get("X-RateLimit-Reset", time.time())) - time.time()) + RESET_MARGIN_SECONDS
+        return None
+
+
+class GithubCommitDiscovery:
+    """
+    Finds a user's commits through the commit search API with an async HTTP client.
+
+    The first page tells how many results there are; the remaining pages are
+    then fetched concurrently. A query returns at most SEARCH_RESULT_LIMIT
+    results, newest first, so when there are more the older commits are
+    searched for in author-date windows that end where the previous results
+    stopped. Only the fields the analysis needs are read from the search
+    results, so no follow-up requests are made per commit.
+    """
+
+    def __init__(self, token: str, api_url: str, concurrency: int, cache: Optional[HttpResponseCache] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.logger = logging_util.get_logger(__name__)
+        self.token = token
+        self.api_url = api_url
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.transport = transport
+
+    def discover(self, username: str, since: Optional[datetime] = None) -> DiscoveryResult:
+        """Blocking entry point for callers outside an event loop."""
+        return asyncio.run(self.discover_async(username, since))
+
+    async def discover_async(self, username: str, since: Optional[datetime] = None) -> DiscoveryResult:
+        """
+        Finds the commits authored by a user.
+
+        Args:
+            username: GitHub login of the author.
+            since: Only commits with this author date or later are searched for.
+        """
+        headers = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        scheduler = RateLimitScheduler()
+        commits = dict[str, DiscoveredCommit]()
+        complete = True
+        until = None
+        async with httpx.AsyncClient(base_url=self.api_url, headers=headers, timeout=30.0, transport=self.transport) as client:
+            for _ in range(MAX_SEARCH_WINDOWS):
+                query = self._query(username, since, until)
+                window_commits, total_count, window_complete = await self._search(client, scheduler, query)
+                for commit in window_commits:
+                    # Results can shift between pages while they are fetched, and windows share their boundary
+                    commits.setdefault(commit.sha, commit)
+                complete = complete and window_complete
+                if total_count <= SEARCH_RESULT_LIMIT or not window_complete:
+                    break
+                # Only the newest results of a query are returned, so the older ones are searched for
+                # in a window that ends where this one's results stop
+                oldest = min(commit.timestamp for commit in window_commits)
+                if until is not None and oldest >= until:
+                    self.logger.warning(f"More than {SEARCH_RESULT_LIMIT} commits for '{query}' share one author date, some are missing")
+                    complete = False
+                    break
+                until = oldest
+            else:
+                self.logger.warning(f"Stopped discovering commits for {username} after {MAX_SEARCH_WINDOWS} search windows")
+                complete = False
+        return DiscoveryResult(commits=list(commits.values()), complete=complete)
+
+    def _query(self, username: str, since: Optional[datetime], until: Optional[datetime]) -> str:
+        query = f"author:{username}"
+        # Both bounds are inclusive, so commits sharing a boundary second aren't missed; callers dedupe by SHA
+        if since is not None and until is not None:
+            query += f" author-date:{self._format_date(since)}..{self._format_date(until)}"
+        elif since is not None:
+            query += f" author-date:>={self._format_date(since)}"
+        elif until is not None:
+            query += f" author-date:<={self._format_date(until)}"
+        return query
+
+    def _format_date(self, date: datetime) -> str:
+        return date.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    async def _search(self, client: httpx.AsyncClient, scheduler: RateLimitScheduler, query: str) -> tuple[list[DiscoveredCommit], int, bool]:
+        """
+        Fetches every result page of a query.
+
+        Returns:
+            The commits found, the total number of matches reported by GitHub (of which
+            at most SEARCH_RESULT_LIMIT are returned), and whether all pages were fetched.
+        """
+        first_page = await self._fetch_page(client, scheduler, query, 1)
+        if first_page is None:
+            return [], 0, False
+        total_count = first_page.get("total_count", 0)
+        page_count = math.ceil(min(total_count, SEARCH_RESULT_LIMIT) / SEARCH_PAGE_SIZE)
+        self.logger.info(f"Found {total_count} commits for '{query}' in {page_count} pages")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(page: int):
+            async with semaphore:
+                return await self._fetch_page(client, scheduler, query, page)
+
+        pages = [first_page] + await asyncio.gather(*(fetch(page) for page in range(2, page_count + 1)))
+        commits = list[DiscoveredCommit]()
+        complete = True
+        for page in pages:
+            if page is None:
+                complete = False
+                continue
+            commits.extend(self._parse_item(item) for item in page.get("items", []))
+        if complete and total_count > 0 and len(commits) == 0:
+            complete = False
+        return commits, total_count, complete
+
+    async def _fetch_page(self, client: httpx.AsyncClient, scheduler: RateLimitScheduler, query: str, page: int) -> Optional[dict]:
+        params = {
+            "q": query,
+            # A fixed order keeps pages stable while they are fetched concurrently
+            "sort": "author-date",
+            "order": "desc",
+            "per_page": SEARCH_PAGE_SIZE,
+            "page": page,
+        }
+        key, cached, conditional_headers = None, None, {}
+        if self.cache is not None:
+            # The cache lives in MongoDB, so it is read off the event loop
+            key, cached, conditional_headers = await asyncio.to_thread(self.cache.prepare, "/search/commits", params)
+            if cached is not None and cached.is_fresh:
+                return cached.json()
+
+        for attempt in range(MAX_RETRIES + 1):
+            await scheduler.acquire()
+            try:
+                response = await client.get("/search/commits", params=params, headers=conditional_headers)
+            except httpx.HTTPError as e:
+                self.logger.warning(f"Error fetching commit search page {page} for '{query}': {e}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            scheduler.update(response)
+            if response.status_code == 200 and self.cache is None:
+                return response.json()
+            if response.status_code in (200, 304) and self.cache is not None:
+                body = await asyncio.to_thread(self.cache.resolve, key, cached, response)
+                if body is not None:
+                    return json.loads(body)
+
+            delay = scheduler.retry_delay(response)
+            if delay is None and response.status_code >= 500:
+                delay = 2 ** attempt
+            if delay is None:
+                self.logger.error(f"Commit search page {page} for '{query}' failed with {response.status_code}: {response.text}")
+                return None
+            self.logger.warning(f"Commit search page {page} for '{query}' got {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        self.logger.error(f"Giving up on commit search page {page} for '{query}' after {MAX_RETRIES} retries")
+        return None
+
+    def _parse_item(self, item: dict) -> DiscoveredCommit:
+        repository = item["repository"]
+        return DiscoveredCommit(
+            sha=item["sha"],
+            message=item["commit"]["message"],
+            timestamp=datetime.fromisoformat(item["commit"]["author"]["date"].replace("Z", "+00:00")),
+            parent_count=len(item.get("parents", [])),
+            repo_full_name=repository["full_name"],
+            repo_name=repository["name"],
+            repo_api_url=repository["url"],
+        )
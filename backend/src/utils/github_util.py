@@ -5,41 +5,88 @@ from github.NamedUser import NamedUser
 from github.AuthenticatedUser import AuthenticatedUser
 import json
 import base64
+import requests
 
-from typing import Union
+from dataclasses import asdict
+from datetime import timezone
+from typing import Optional, Union
 from config import Config
+from db import db
+from utils.github_discovery import DiscoveredCommit, GithubCommitDiscovery
+from utils.http_cache import http_cache
+from utils.http_sessions import http_sessions
 from utils.logging_util import logging_util
 
+# Items per page when listing through the REST API
+PAGE_SIZE = 100
+
 class GithubUtil:
     def __init__(self):
         self.logger = logging_util.get_logger(__name__)
         # using an access token
         self.auth = Auth.Token(Config.GITHUB_ACCESS_TOKEN)
         self.github = Github(auth=self.auth)
+        # Plain API calls go through the pooled sessions so responses can be cached and revalidated
+        self.headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": f"Bearer {Config.GITHUB_ACCESS_TOKEN}",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        self.commit_discovery = GithubCommitDiscovery(Config.GITHUB_ACCESS_TOKEN, Config.GITHUB_API_URL, Config.GITHUB_SEARCH_CONCURRENCY, http_cache)
     
     def get_user(self, username: str) -> Union[NamedUser, AuthenticatedUser, None]:
         if username is None:
             return None
-        user =  self.github.get_user(username)
-        if user is None:
+        data = self._get_json(f"/users/{username}")
+        if data is None:
             return None
-        return user
+        return self.github.create_from_raw_data(NamedUser, data)
     
     def get_repositories_for_username(self, username: str):
-        user = self.github.get_user(username)
-        repos = user.get_repos()
-        return [Config.GITHUB_REPO_BASE_URL + repo.full_name for repo in repos]
+        repos = self._get_all_pages(f"/users/{username}/repos")
+        return [Config.GITHUB_REPO_BASE_URL + repo["full_name"] for repo in repos]
 
     def get_repositories_for_user(self, user: User):
         if user is None or user.username is None:
             return []
             
-        github_user = self.github.get_user(user.username)
-        repos = github_user.get_repos()
+        github_user = self.get_user(user.username)
+        if github_user is None:
+            return []
+        repos = self._get_all_pages(f"/users/{user.username}/repos")
         
         if github_user.name is not None:
             user.name = github_user.name
-        return [Config.GITHUB_REPO_BASE_URL + repo.full_name for repo in repos]
+        return [Config.GITHUB_REPO_BASE_URL + repo["full_name"] for repo in repos]
+
+    def _get_json(self, path: str, params: Optional[dict] = None):
+        """GET an API path, revalidating a cached response with its ETag instead of refetching it."""
+        key, cached, conditional_headers = http_cache.prepare(path, params)
+        if cached is not None and cached.is_fresh:
+            return cached.json()
+        try:
+            response = http_sessions.get(Config.GITHUB_API_URL + path, params=params, headers={**self.headers, **conditional_headers})
+        except requests.RequestException as e:
+            self.logger.error(f"Error fetching {path}: {e}")
+            return None
+        body = http_cache.resolve(key, cached, response)
+        if body is None:
+            self.logger.error(f"Fetching {path} failed with {response.status_code}")
+            return None
+        return json.loads(body)
+
+    def _get_all_pages(self, path: str) -> list:
+        items = []
+        page = 1
+        while True:
+            page_items = self._get_json(path, {"per_page": PAGE_SIZE, "page": page})
+            if not page_items:
+                break
+            items.extend(page_items)
+            if len(page_items) < PAGE_SIZE:
+                break
+            page += 1
+        return items
     
     def print_rate_limit(self):
         rate_limit = self.github.get_rate_limit()
@@ -47,35 +94,27 @@ class GithubUtil:
     
    
     def get_commits_for_user(self, username: str) -> list[RepoDetails]:
-        commits = self.github.search_commits(query=f"author:{username}")
+        commits = self._discover_commits(username)
         repos_details = dict[str, RepoDetails]()
         all_commits = list[CommitDetails]()
-        # count = 0
         for commit in commits:
             # skip merge commits, merge commits have more than 1 parent
-            if(len(commit._parents.value) > 1):
-                # print('skipping merge commit', commit.sha, commit.commit.message, 'parents', commit._parents.value, len(commit._parents.value))
+            if commit.parent_count > 1:
                 continue
-            # print(commit.commit.message, commit.repository.url, commit.sha)
-            # if(commit.repository.full_name != "mranish592/simple-drive"):
-                # continue
-            # count += 1
-            # if count > 3:
-            #     break
-            
+
             repo_detail = RepoDetails(
-                url=Config.GITHUB_REPO_BASE_URL + commit.repository.full_name,
-                name=commit.repository.name,
+                url=Config.GITHUB_REPO_BASE_URL + commit.repo_full_name,
+                name=commit.repo_name,
                 languages=[],
                 frameworks=[],
                 commits=[]
             )
-            repos_details.update({commit.repository.url: repo_detail})
+            repos_details.setdefault(commit.repo_api_url, repo_detail)
             commit_details = CommitDetails(
-                repo_url=commit.repository.url,
+                repo_url=commit.repo_api_url,
                 hash=commit.sha,
-                message=commit.commit.message,
-                timestamp=commit.commit.author.date,
+                message=commit.message,
+                timestamp=commit.timestamp,
                 files=dict[str, FileInfo]()
             )
             all_commits.append(commit_details)
@@ -86,6 +125,33 @@ class GithubUtil:
 
         return list(repos_details.values())
         
+    def _discover_commits(self, username: str) -> list[DiscoveredCommit]:
+        """
+        Discovers a user's commits, searching only for the ones authored since the last discovery
+        when there is a watermark stored for the user.
+        """
+        watermark = db.find_discovery_watermark(username) if Config.INCREMENTAL_DISCOVERY else None
+        since = watermark["author_date"].replace(tzinfo=timezone.utc) if watermark is not None else None
+        # Search result pages are fetched concurrently, paced by the rate limit headers
+        result = self.commit_discovery.discover(username, since)
+        if not Config.INCREMENTAL_DISCOVERY:
+            return result.commits
+
+        seen_shas = set(watermark["shas"]) if watermark is not None else set()
+        new_commits = [commit for commit in result.commits if commit.sha not in seen_shas]
+        self.logger.info(f"Discovered {len(new_commits)} new commits for {username} since {since}")
+        # Commits are stored before the watermark moves, so an interrupted run can't skip any
+        db.save_discovered_commits(username, [asdict(commit) for commit in new_commits])
+        if result.complete and len(new_commits) > 0:
+            latest = max(commit.timestamp for commit in result.commits)
+            db.save_discovery_watermark(username, latest, [commit.sha for commit in result.commits if commit.timestamp == latest])
+
+        commits = list[DiscoveredCommit]()
+        for stored in db.find_discovered_commits(username):
+            stored["timestamp"] = stored["timestamp"].replace(tzinfo=timezone.utc)
+            commits.append(DiscoveredCommit(**stored))
+        return commits
+
     def close(self):
         self.github.close()
         
@@ -0,0 +1,131 @@
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional, Union
+from urllib.parse import urlencode
+import httpx
+import requests
+from pymongo.errors import PyMongoError
+from config import Config
+from db import db
+from utils.logging_util import logging_util
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+@dataclass
+class CachedResponse:
+    key: str
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh_until: datetime
+
+    @property
+    def is_fresh(self) -> bool:
+        return datetime.utcnow() < self.fresh_until
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class HttpResponseCache:
+    """
+    Persists API responses in MongoDB together with their ETag and Last-Modified headers.
+
+    Responses are served without a request while they are fresh according to
+    their Cache-Control max-age. After that they are revalidated with
+    If-None-Match / If-Modified-Since; a 304 answer doesn't count against
+    GitHub's primary rate limit. Entries expire ttl_seconds after their last
+    use, and the least recently used ones are evicted beyond max_entries.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: int, max_entries: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def key(self, url: str, params: Optional[dict] = None) -> str:
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def prepare(self, url: str, params: Optional[dict] = None) -> tuple[str, Optional[CachedResponse], dict[str, str]]:
+        """
+        Looks up a request in the cache.
+
+        Returns:
+            The cache key, the cached response if there is one, and the conditional
+            headers to send when the cached response isn't fresh.
+        """
+        key = self.key(url, params)
+        cached = self._find(key) if self.enabled else None
+        headers = {}
+        if cached is not None:
+            if cached.etag is not None:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified is not None:
+                headers["If-Modified-Since"] = cached.last_modified
+        return key, cached, headers
+
+    def resolve(self, key: str, cached: Optional[CachedResponse], response: Union[httpx.Response, requests.Response]) -> Optional[str]:
+        """
+        Records a response and returns the body to use: the cached one for a 304,
+        the new one for a 200, or None for anything else.
+        """
+        if response.status_code == 304:
+            if cached is None:
+                return None
+            self._save(key, lambda: db.touch_http_cache_entry(key, self._timestamps(response)))
+            return cached.body
+        if response.status_code != 200:
+            return None
+        if self.enabled and ("ETag" in response.headers or "Last-Modified" in response.headers):
+            entry = {
+                "key": key,
+                "body": response.text,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                **self._timestamps(response),
+            }
+            self._save(key, lambda: db.save_http_cache_entry(entry))
+            self._save(key, lambda: db.evict_http_cache_entries(self.max_entries))
+        return response.text
+
+    def _timestamps(self, response: Union[httpx.Response, requests.Response]) -> dict[str, datetime]:
+        now = datetime.utcnow()
+        match = MAX_AGE_PATTERN.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else 0
+        return {
+            "fresh_until": now + timedelta(seconds=max_age),
+            "last_used_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+
+    def _find(self, key: str) -> Optional[CachedResponse]:
+        try:
+            entry = db.find_http_cache_entry(key)
+        except PyMongoError as e:
+            self.logger.warning(f"Error reading cached response for {key}: {e}")
+            return None
+        if entry is None:
+            return None
+        return CachedResponse(
+            key=key,
+            body=entry["body"],
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified"),
+            fresh_until=entry["fresh_until"],
+        )
+
+    def _save(self, key: str, write):
+        try:
+            write()
+        except PyMongoError as e:
+            # The response is still usable, it just won't be cached
+            self.logger.warning(f"Error caching response for {key}: {e}")
+
+
+http_cache = HttpResponseCache(Config.HTTP_CACHE_ENABLED, Config.HTTP_CACHE_TTL_SECONDS, Config.HTTP_CACHE_MAX_ENTRIES)
@@ -0,0 +1,97 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from core.models import HostConnectionStats
+from utils.logging_util import logging_util
+
+# Transient server errors that are retried; rate limits are handled by the callers
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class HttpSessionPool:
+    """
+    Shares one keep-alive `requests.Session` per host between all threads.
+
+    Each session has a connection pool of pool_size connections, so repeated
+    calls to the same host reuse open TCP/TLS connections instead of opening
+    a new one per request. Idempotent requests are retried with backoff on
+    connection errors and transient 5xx responses, and every request gets a
+    timeout unless the caller passes one.
+    """
+
+    def __init__(self, pool_size: int, timeout_seconds: float, retries: int, backoff_factor: float):
+        self.logger = logging_util.get_logger(__name__)
+        self.pool_size = max(1, pool_size)
+        self.timeout_seconds = timeout_seconds
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._sessions = dict[str, requests.Session]()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout_seconds)
+        return self.session(url).get(url, **kwargs)
+
+    def session(self, url: str) -> requests.Session:
+        """Returns the session for the host of url, creating it on first use."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._create_session(host)
+                self._sessions[host] = session
+            return session
+
+    def stats(self) -> list[HostConnectionStats]:
+        """Returns how many connections were opened per host for how many requests."""
+        with self._lock:
+            sessions = dict(self._sessions)
+        stats = []
+        for host, session in sessions.items():
+            host_stats = HostConnectionStats(host=host, requests=0, connections_opened=0, connections_reused=0, idle_connections=0, pool_size=self.pool_size)
+            pools = session.get_adapter(f"{host}/").poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host_stats.requests += pool.num_requests
+                host_stats.connections_opened += pool.num_connections
+                if pool.pool is not None:
+                    host_stats.idle_connections += sum(1 for connection in list(pool.pool.queue) if connection is not None)
+            host_stats.connections_reused = max(0, host_stats.requests - host_stats.connections_opened)
+            stats.append(host_stats)
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def _create_session(self, host: str) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            # The last response is returned as is instead of raising, so callers see its status
+            raise_on_status=False
+        )
+        # A session only talks to one host, so it needs a single pool of pool_size connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry, pool_block=False)
+        session = requests.Session()
+        session.mount(f"{host}/", adapter)
+        self.logger.info(f"Created HTTP session for {host} with {self.pool_size} pooled connections")
+        return session
+
+
+http_sessions = HttpSessionPool(
+    Config.HTTP_POOL_SIZE,
+    Config.HTTP_TIMEOUT_SECONDS,
+    Config.HTTP_RETRIES,
+    Config.HTTP_RETRY_BACKOFF_SECONDS
+)
@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from config import Config
+from core.models import FileInfo
+from utils.blob_reader import blob_reader_pool
+from utils.import_detector import import_detector
+from utils.logging_util import logging_util
+
+
+@dataclass
+class ImportSummary:
+    blob_sha: str
+    imports: set[str]
+    # 1-based line of the last import in the blob, 0 if it has none
+    import_region_end: int
+    # 1-based line where the scan stopped because the import block ended, 0 if it reached the end
+    import_block_end: int = 0
+
+
+@dataclass
+class TrackedImports:
+    imports: set[str]
+    # The text framework detection should look at: the file header or the added lines
+    content: str
+    # Whether the imports and content came from the whole blob, so the result can be cached per blob
+    full_parse: bool
+
+
+class HunkImportTracker:
+    """
+    Tracks the imports of every file of one repository across its commits.
+
+    Commits have to be fed in chronological order. When a commit only changes
+    lines below a file's import region, the imports are updated from the
+    diff hunks alone; otherwise the start of the new blob is parsed again.
+    """
+
+    def __init__(self, repo_path: str):
+        self.logger = logging_util.get_logger(__name__)
+        self.repo_path = repo_path
+        self._summaries = dict[str, ImportSummary]()
+
+    def track(self, file: FileInfo) -> TrackedImports:
+        """
+        Returns the imports of a file after the commit its hunks come from.
+
+        Args:
+            file: FileInfo with blob ids, language and diff hunks set.
+
+        Returns:
+            TrackedImports for the file's new blob.
+        """
+        if file.blob_sha is None:
+            self._summaries.pop(file.file_path, None)
+            return TrackedImports(imports=set(), content="", full_parse=True)
+
+        summary = self._summaries.get(file.file_path)
+        if summary is not None and summary.blob_sha == file.previous_blob_sha and file.hunks is not None:
+            tracked = self._apply_hunks(file, summary)
+            if tracked is not None:
+                return tracked
+        return self._parse_header(file)
+
+    def _apply_hunks(self, file: FileInfo, summary: ImportSummary) -> TrackedImports | None:
+        # Any change at or above the end of the import region can shift or rewrite it
+        region_end = summary.import_block_end or summary.import_region_end
+        if any(hunk.old_start <= region_end for hunk in file.hunks):
+            return None
+        added = "\n".join(line for hunk in file.hunks for line in hunk.added_lines)
+        if not added:
+            # Framework detection skips files without content, so a change that only deletes
+            # lines would lose the frameworks its imports still point to
+            return None
+        if summary.import_block_end:
+            # The scan stops at the end of the import block, so changes below it never affect the imports
+            self._summaries[file.file_path] = ImportSummary(
+                blob_sha=file.blob_sha,
+                imports=summary.imports,
+                import_region_end=summary.import_region_end,
+                import_block_end=summary.import_block_end)
+            return TrackedImports(imports=summary.imports, content=added, full_parse=False)
+
+        removed = "\n".join(line for hunk in file.hunks for line in hunk.removed_lines)
+        if import_detector.find_imports_for_language(removed, file.language):
+            # An import further down the file was removed; only a full parse can tell if it is still used
+            return None
+
+        imports = set(summary.imports)
+        for hunk in file.hunks:
+            added_imports, added_end, added_block_end = import_detector.find_import_region("\n".join(hunk.added_lines), file.language)
+            if added_block_end:
+                # The change ends the import block, which moves where a full scan would stop
+                return None
+            if added_imports:
+                imports.update(added_imports)
+                region_end = max(region_end, hunk.new_start + added_end - 1)
+
+        self._summaries[file.file_path] = ImportSummary(blob_sha=file.blob_sha, imports=imports, import_region_end=region_end)
+        return TrackedImports(imports=imports, content=added, full_parse=False)
+
+    def _parse_header(self, file: FileInfo) -> TrackedImports:
+        blob = blob_reader_pool.get(self.repo_path).read(file.blob_sha, Config.BLOB_HEADER_BYTES)
+        if blob is None:
+            self.logger.warning(f"Blob {file.blob_sha} of {file.file_path} not found in {self.repo_path}")
+            self._summaries.pop(file.file_path, None)
+            return TrackedImports(imports=set(), content="", full_parse=False)
+
+        content = blob.data.decode('utf-8', errors='ignore')
+        imports, region_end, block_end = import_detector.find_import_region(content, file.language)
+        self._summaries[file.file_path] = ImportSummary(blob_sha=file.blob_sha, imports=imports, import_region_end=region_end, import_block_end=block_end)
+        # Only the header is read, so the result matches a detection of the whole blob only if nothing was cut off
+        return TrackedImports(imports=imports, content=content, full_parse=not blob.truncated)
@@ -1,4 +1,6 @@
 import logging # Optional: for logging parsing issues
+import re
+from config import Config
 from utils.logging_util import logging_util
 
 # --- Keyword Definitions (Required for the specified language) ---
@@ -51,123 +53,156 @@ IMPORT_START_KEYWORDS = {
     # Add other languages or refine patterns as needed
 }
 
+# --- Import Block End Markers ---
+# Lines (matched at column 0) after which a language can't have any more file-level imports.
+# Scanning stops at the first one when the early exit is enabled. Languages without an entry
+# are scanned to the end, e.g. Ruby, whose `include` lines live inside class bodies.
+IMPORT_BLOCK_END = {
+    "Python": r'(?:async[^\S\n]+def|def|class)\b',
+    "Java": r'(?:(?:public|protected|private|abstract|final|sealed|static)[^\S\n]+)*(?:class|interface|enum|record)\b|@',
+    "Kotlin": r'(?:(?:public|private|internal|abstract|open|data|sealed|enum|inline|value|annotation)[^\S\n]+)*(?:class|interface|object|fun|val|var|typealias)\b|@',
+    "JavaScript": r'(?:export[^\S\n]+)?(?:default[^\S\n]+)?(?:async[^\S\n]+)?(?:function|class)\b',
+    "TypeScript": r'(?:export[^\S\n]+)?(?:default[^\S\n]+)?(?:abstract[^\S\n]+)?(?:async[^\S\n]+)?(?:function|class|interface|enum)\b',
+    "Go": r'(?:func|type|var|const)\b',
+    "Rust": r'(?:pub(?:\([^)\n]*\))?[^\S\n]+)?(?:fn|struct|enum|impl|trait)\b',
+    "PHP": r'(?:(?:abstract|final|readonly)[^\S\n]+)*(?:class|interface|trait|function)\b',
+    "Dart": r'(?:abstract[^\S\n]+)?(?:class|mixin|enum|extension|typedef|void)\b',
+    "C#": r'(?:(?:public|internal|private|protected|static|sealed|abstract|partial|unsafe)[^\S\n]+)*(?:class|interface|struct|enum|record|delegate)\b',
+}
+
 class ImportDetector:
-    # --- Helper Function for Name Extraction ---
-    def __init__(self):
+    """
+    Finds the imports of a file with one precompiled regex per language.
+
+    The regex matches any line whose first non-blank text is one of the
+    language's import keywords, so comment and code lines are skipped by the
+    regex engine instead of being split, stripped and tested in Python.
+    """
+
+    def __init__(self, early_exit: bool = False):
         self.logger = logging_util.get_logger(__name__)
-        pass
+        self.early_exit = early_exit
+        self._extractors = {
+            'python_from': self._extract_python_from,
+            'python_import': self._extract_python_import,
+            'java_style': self._extract_until_semicolon,
+            'csharp_using': self._extract_until_semicolon,
+            'kotlin_style': self._extract_payload,
+            'js_import': self._extract_js_import,
+            'js_require': self._extract_require,
+            'php_require': self._extract_require,
+            'go_quoted': self._extract_go_quoted,
+            'rust_use': self._extract_rust_use,
+            'rust_extern_crate': self._extract_until_semicolon,
+            'php_use': self._extract_php_use,
+            'ruby_require': self._extract_quoted,
+            'ruby_include': self._extract_first_word,
+            'dart_import': self._extract_dart_import,
+        }
+        self._scanners = {language: self._compile_scanner(language, keywords) for language, keywords in IMPORT_START_KEYWORDS.items()}
+
+    def _compile_scanner(self, language, keywords):
+        """
+        Builds the scanner for a language and the keyword to extraction method lookup it dispatches through.
+        Alternatives are tried in list order, so more specific prefixes still win.
+        """
+        keyword_pattern = "|".join(re.escape(keyword) for keyword, _ in keywords)
+        pattern = rf'^[^\S\n]*(?P<keyword>{keyword_pattern})(?P<payload>[^\n]*)'
+        block_end = IMPORT_BLOCK_END.get(language)
+        if self.early_exit and block_end is not None:
+            pattern += rf'|^(?P<end>{block_end})'
+        methods = dict(keywords)
+        return re.compile(pattern, re.MULTILINE), methods
 
-    def _extract_module_name(self, line, keyword, method):
+    # --- Helper Functions for Name Extraction ---
+    def _extract_module_name(self, payload, method):
         """
-        Helper function to extract the module name based on the language convention.
+        Extracts the module name from the text following an import keyword.
         This is a simplified parser, may not cover all edge cases.
-        (Implementation details are the same as the previous answer)
         """
+        payload = payload.strip()
+        if not payload: return None
         try:
-            payload = line[len(keyword):].strip()
-            if not payload: return None
-
-            # Python
-            if method == 'python_from':
-                parts = payload.split()
-                if parts: return parts[0].split('.')[0]
-            elif method == 'python_import':
-                parts = payload.split()
-                if parts: return parts[0].split(',')[0].strip().split('.')[0]
-            # Java / C#
-            elif method == 'java_style' or method == 'csharp_using':
-                return payload.split(';')[0].strip()
-            # Kotlin
-            elif method == 'kotlin_style':
-                return payload
-            # JavaScript / TypeScript Import
-            elif method == 'js_import':
-                last_s_quote = payload.rfind("'")
-                last_d_quote = payload.rfind('"')
-                if last_s_quote == -1 and last_d_quote == -1:
-                    first_s_quote = payload.find("'")
-                    first_d_quote = payload.find('"')
-                    if first_s_quote != -1:
-                        end_quote = payload.find("'", first_s_quote + 1)
-                        if end_quote != -1: return payload[first_s_quote+1:end_quote]
-                    if first_d_quote != -1:
-                        end_quote = payload.find('"', first_d_quote + 1)
-                        if end_quote != -1: return payload[first_d_quote+1:end_quote]
-                    return None
-                elif last_s_quote > last_d_quote:
-                    start_quote = payload.rfind("'", 0, last_s_quote)
-                    if start_quote != -1: return payload[start_quote + 1 : last_s_quote]
-                else:
-                    start_quote = payload.rfind('"', 0, last_d_quote)
-                    if start_quote != -1: return payload[start_quote + 1 : last_d_quote]
-            # JavaScript / TypeScript / PHP Require
-            elif method == 'js_require' or method == 'php_require':
-                end_paren = payload.find(')')
-                if end_paren == -1: return None
-                content_in_parens = payload[:end_paren].strip()
-                if len(content_in_parens) > 1:
-                    if content_in_parens.startswith("'") and content_in_parens.endswith("'"): return content_in_parens[1:-1]
-                    if content_in_parens.startswith('"') and content_in_parens.endswith('"'): return content_in_parens[1:-1]
-            # Go
-            elif method == 'go_quoted':
-                end_quote = payload.find('"')
-                if end_quote != -1: return payload[:end_quote]
-            # Rust Use
-            elif method == 'rust_use':
-                term_semi = payload.find(';')
-                term_brace = payload.find('{')
-                end = len(payload)
-                if term_semi != -1: end = min(end, term_semi)
-                name_part = payload[:end].strip()
-                if term_brace != -1 and term_brace < end: name_part = name_part[:term_brace].strip()
-                return name_part.split('::')[0].strip()
-            # Rust Extern Crate
-            elif method == 'rust_extern_crate':
-                return payload.split(';')[0].strip()
-            # PHP Use
-            elif method == 'php_use':
-                term_semi = payload.find(';')
-                term_brace = payload.find('{')
-                end = len(payload)
-                if term_semi != -1: end = min(end, term_semi)
-                name_part = payload[:end].strip()
-                if term_brace != -1 and term_brace < end: name_part = name_part[:term_brace].strip()
-                return name_part
-            # Ruby Require
-            elif method == 'ruby_require':
-                payload = payload.strip()
-                if len(payload) > 1:
-                    if payload.startswith("'") and payload.endswith("'"): return payload[1:-1]
-                    if payload.startswith('"') and payload.endswith('"'): return payload[1:-1]
-            # Ruby Include
-            elif method == 'ruby_include':
-                parts = payload.split()
-                if parts: return parts[0]
-            # Dart Import
-            elif method == 'dart_import':
-                s_quote = payload.find("'")
-                d_quote = payload.find('"')
-                if s_quote == -1 and d_quote == -1: return None
-                if s_quote != -1:
-                    start_quote = s_quote
-                    end_quote = payload.find("'", start_quote + 1)
-                else:
-                    start_quote = d_quote
-                    end_quote = payload.find('"', start_quote + 1)
-                if end_quote != -1: return payload[start_quote + 1 : end_quote].split(' ')[0]
-
+            return self._extractors[method](payload)
         except Exception as e:
             # Log or print error if needed
-            # print(f"Error parsing import line: '{line}' with keyword '{keyword}'. Error: {e}")
+            # print(f"Error parsing import payload: '{payload}' with method '{method}'. Error: {e}")
+            return None
+
+    def _extract_payload(self, payload):
+        return payload
+
+    def _extract_first_word(self, payload):
+        return payload.split()[0]
+
+    def _extract_until_semicolon(self, payload):
+        return payload.split(';')[0].strip()
+
+    def _extract_python_from(self, payload):
+        return payload.split()[0].split('.')[0]
+
+    def _extract_python_import(self, payload):
+        return payload.split()[0].split(',')[0].strip().split('.')[0]
+
+    def _extract_js_import(self, payload):
+        last_s_quote = payload.rfind("'")
+        last_d_quote = payload.rfind('"')
+        if last_s_quote == -1 and last_d_quote == -1:
             return None
-        return None # Default return if no specific logic matched or failed
+        if last_s_quote > last_d_quote:
+            start_quote = payload.rfind("'", 0, last_s_quote)
+            if start_quote != -1: return payload[start_quote + 1 : last_s_quote]
+        else:
+            start_quote = payload.rfind('"', 0, last_d_quote)
+            if start_quote != -1: return payload[start_quote + 1 : last_d_quote]
+        return None
 
+    def _extract_require(self, payload):
+        end_paren = payload.find(')')
+        if end_paren == -1: return None
+        return self._extract_quoted(payload[:end_paren].strip())
 
-    # --- Main Function ---
+    def _extract_quoted(self, payload):
+        if len(payload) > 1:
+            if payload.startswith("'") and payload.endswith("'"): return payload[1:-1]
+            if payload.startswith('"') and payload.endswith('"'): return payload[1:-1]
+        return None
+
+    def _extract_go_quoted(self, payload):
+        end_quote = payload.find('"')
+        if end_quote != -1: return payload[:end_quote]
+        return None
+
+    def _extract_rust_use(self, payload):
+        return self._extract_php_use(payload).split('::')[0].strip()
+
+    def _extract_php_use(self, payload):
+        term_semi = payload.find(';')
+        term_brace = payload.find('{')
+        end = len(payload)
+        if term_semi != -1: end = min(end, term_semi)
+        name_part = payload[:end].strip()
+        if term_brace != -1 and term_brace < end: name_part = name_part[:term_brace].strip()
+        return name_part
+
+    def _extract_dart_import(self, payload):
+        s_quote = payload.find("'")
+        d_quote = payload.find('"')
+        if s_quote == -1 and d_quote == -1: return None
+        if s_quote != -1:
+            start_quote = s_quote
+            end_quote = payload.find("'", start_quote + 1)
+        else:
+            start_quote = d_quote
+            end_quote = payload.find('"', start_quote + 1)
+        if end_quote != -1: return payload[start_quote + 1 : end_quote].split(' ')[0]
+        return None
+
+    # --- Main Functions ---
     def find_imports_for_language(self, file_content, language):
         """
         Finds import statements in the given file content for a specific language
-        by checking line prefixes using predefined keywords for that language.
+        by matching line prefixes against predefined keywords for that language.
 
         Args:
             file_content (str): The source code content.
@@ -177,38 +212,51 @@ class ImportDetector:
             set: A set of unique imported module/package/library names found for that language.
                 Returns an empty set if the language is not defined or no imports are found.
         """
-        imports = set()
-
-        # Get the list of (keyword, method) tuples *only* for the specified language
-        language_keywords = IMPORT_START_KEYWORDS.get(language)
-
-        if not language_keywords:
-            self.logger.debug(f"Warning: Import keywords not defined for language: {language}")
-            return imports # Return empty set if language rules aren't defined
+        return {module_name for _, module_name in self._iter_imports(file_content, language)[0]}
 
-        lines = file_content.splitlines()
+    def find_import_region(self, file_content, language):
+        """
+        Finds the imports of a file together with where its import region ends.
 
-        for line in lines:
-            stripped_line = line.strip()
+        Args:
+            file_content (str): The source code content, usually just the start of the file.
+            language (str): The specific programming language (e.g., 'Python', 'Java').
 
-            # Basic check to ignore empty lines and potentially simple comments
-            if not stripped_line or stripped_line.startswith(('#', '//', '--', '/*')): # Add other common comment chars if needed
-                continue
+        Returns:
+            tuple: The set of imported names, the 1-based number of the last import
+                line (0 if there is none) and the line the scan stopped at because
+                the import block ended (0 if it ran to the end of the content).
+        """
+        found, block_end = self._iter_imports(file_content, language)
+        imports = set()
+        region_end = 0
+        for line_number, module_name in found:
+            imports.add(module_name)
+            region_end = line_number
+        return imports, region_end, block_end
 
-            # Check against the keywords *only* for the specified language
-            for keyword, method in language_keywords:
-                if stripped_line.startswith(keyword):
-                    # Found a line starting with an import keyword for this language
-                    module_name = self._extract_module_name(stripped_line, keyword, method)
-                    if module_name:
-                        imports.add(module_name)
-                    # Once matched for this line, move to the next line
-                    break
+    def _iter_imports(self, file_content, language):
+        scanner = self._scanners.get(language)
+        if scanner is None:
+            self.logger.debug(f"Warning: Import keywords not defined for language: {language}")
+            return [], 0 # Nothing found if language rules aren't defined
+        pattern, methods = scanner
 
-        return imports
+        found = []
+        line_number = 1
+        position = 0
+        for match in pattern.finditer(file_content):
+            line_number += file_content.count("\n", position, match.start())
+            position = match.start()
+            if match.lastgroup == "end":
+                return found, line_number
+            module_name = self._extract_module_name(match.group("payload"), methods[match.group("keyword")])
+            if module_name:
+                found.append((line_number, module_name))
+        return found, 0
 
 # --- Example Usage ---
-import_detector = ImportDetector()
+import_detector = ImportDetector(Config.IMPORT_SCAN_EARLY_EXIT)
 
 if __name__ == "__main__":
     # 1. Known Language: Python
@@ -251,4 +299,4 @@ if __name__ == "__main__":
     """
     other_imports = import_detector.find_imports_for_language(some_other_code, "Lua") # Assume Lua is not in IMPORT_START_KEYWORDS
     print(f"Found Lua imports: {other_imports}")
-    # Expected: Warning message and empty set {}
\ No newline at end of file
+    # Expected: Warning message and empty set {}
@@ -1,11 +1,36 @@
+import codecs
+import re
+import subprocess
+import threading
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import IO, Iterator
 from config import Config
-from core.models import CommitDetails, FileInfo
+from core.models import CommitDetails, DiffHunk, FileInfo
 import git
-import os
-import shutil
+from utils.blob_reader import blob_reader_pool
+from utils.repo_cache import repo_cache
 from utils.logging_util import logging_util
 
-EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+NULL_SHA = "0" * 40
+COMMIT_HASH_PATTERN = re.compile(r"[0-9a-f]{40}")
+HUNK_HEADER_PATTERN = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+SUBMODULE_MODE = "160000"
+
+# Read size for the streamed diff-tree output
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class FileChange:
+    path: str
+    change_type: str
+    blob_sha: str | None
+    mode: str
+    previous_blob_sha: str | None = None
+    additions: int = 0
+    deletions: int = 0
+
 
 class LocalGitUtil:
     def __init__(self):
@@ -20,109 +45,265 @@ class LocalGitUtil:
             commit_hash (str): The commit hash to inspect.
 
         Returns:
-            dict: A dictionary containing commit details.
+            CommitDetails: The commit details with its files filled in, or None if the commit was not found.
+        """
+        for details in self.iter_commits_details(repo_path, [commit_details]):
+            if details.hash == commit_hash:
+                return details
+        return None
+
+    def iter_commits_details(self, repo_path, commits: list[CommitDetails], with_hunks: bool = False, load_content: bool = True) -> Iterator[CommitDetails]:
         """
-        
+        Fills in the file changes of many commits from a single streamed
+        `git diff-tree --stdin` invocation.
+
+        Per-file additions, deletions, paths and blob ids all come from the one
+        process; blob contents are then read from the object database. Commits
+        are yielded as soon as their output is complete, so callers can start
+        working on early commits while later ones are still being diffed.
+
+        Args:
+            repo_path (str): Path to the local Git repository.
+            commits (list[CommitDetails]): The commits to inspect.
+            with_hunks (bool): Attach the changed hunks of each file from a second
+                streamed `git diff-tree -p -U0` process instead of loading file contents.
+            load_content (bool): Read file contents from the object database. Blob ids are set either way.
+
+        Returns:
+            Iterator[CommitDetails]: The commits that were found, with their files filled in.
+        """
+        if not commits:
+            return
+        commits_by_hash = {commit.hash: commit for commit in commits}
         try:
-            repo = git.Repo(repo_path)
-            commit = repo.commit(commit_hash)
-
-            if len(commit.parents) > 0:
-                parent_commit_sha = commit.parents[0].hexsha
-            else:
-                parent_commit_sha = EMPTY_TREE_SHA
-            
-            file_stats = {}
-            numstat = repo.git.diff(parent_commit_sha, commit.hexsha, numstat=True)
-
-            for line in numstat.strip().split('\n'):
-                if line:
-                    additions, deletions, file_path = line.split('\t')
-                    # Convert to integers, handling special cases
-                    additions = int(additions) if additions != '-' else 0
-                    deletions = int(deletions) if deletions != '-' else 0
-                    
-                    file_stats[file_path] = {'additions': additions, 'deletions': deletions}
-
-            # Print the stats for each file
-            # for file_path, stats in file_stats.items():
-            #     print(f"File: {file_path}")
-            #     print(f"  Additions: {stats['additions']}")
-            #     print(f"  Deletions: {stats['deletions']}")
-
-
-            if(len(commit.parents) == 0):
-                parent_commit = commit
-                commit = None
-            else:
-                parent_commit = commit.parents[0]
-
-            for diff in parent_commit.diff(commit):  # None means against the parent commit
-                change_type = diff.change_type
-                if change_type == "R":
+            git.Repo(repo_path)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+            self.logger.error(f"Error: Invalid Git repository at {repo_path}")
+            return
+
+        with ExitStack() as stack:
+            stdout = stack.enter_context(self._diff_tree(repo_path, ["-z", "--raw", "--numstat"], list(commits_by_hash)))
+            hunk_stream = None
+            if with_hunks:
+                patch_stdout = stack.enter_context(self._diff_tree(repo_path, ["-p", "-U0"], list(commits_by_hash)))
+                hunk_stream = self._parse_patch(patch_stdout)
+
+            for commit_hash, changes in self._parse_diff_tree(self._iter_nul_tokens(stdout)):
+                hunks = None
+                if hunk_stream is not None:
+                    # Both processes get the same hashes, so their output comes in the same order
+                    hunks = next((file_hunks for hunk_hash, file_hunks in hunk_stream if hunk_hash == commit_hash), {})
+                commit_details = commits_by_hash.get(commit_hash)
+                if commit_details is None:
                     continue
-                # print(diff.change_type, diff.a_path, diff.b_path, diff.a_mode, diff.b_mode)
-                additions = 0
-                deletions = 0
-                content = ""
-                if diff.b_blob:
-                        content = diff.b_blob.data_stream.read().decode('utf-8', errors='ignore')
-
-                additions = file_stats[diff.b_path]['additions']
-                deletions = file_stats[diff.b_path]['deletions']
-                content = content
-                line_count = content.count('\n')
-                char_count = len(content)
-                
-                # Skip if diff.b_path is None
-                if diff.b_path is None:
+                self._fill_files(repo_path, commit_details, changes, hunks, load_content)
+                yield commit_details
+
+    @contextmanager
+    def _diff_tree(self, repo_path, args: list[str], commit_hashes: list[str]) -> Iterator[IO[bytes]]:
+        process = subprocess.Popen(
+            ["git", "-c", "core.quotePath=false", "diff-tree", "--stdin", "-r", "--root", "--always", "-M", *args],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        # Feed hashes from a separate thread so a full stdout pipe can't deadlock the writer
+        writer = threading.Thread(target=self._write_commit_hashes, args=(process, commit_hashes), daemon=True)
+        writer.start()
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            writer.join()
+            process.wait()
+
+        if process.returncode != 0:
+            self.logger.error(f"git diff-tree exited with code {process.returncode} for {repo_path}")
+
+    def _write_commit_hashes(self, process: subprocess.Popen, commit_hashes: list[str]):
+        try:
+            for commit_hash in commit_hashes:
+                process.stdin.write(f"{commit_hash}\n".encode())
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def _iter_nul_tokens(self, stream) -> Iterator[str]:
+        pending = b""
+        while True:
+            # read1 returns whatever is in the pipe instead of waiting for a full chunk, so
+            # commits are parsed as soon as git has written them
+            chunk = stream.read1(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            pending += chunk
+            *tokens, pending = pending.split(b"\0")
+            for token in tokens:
+                yield token.decode("utf-8", errors="surrogateescape")
+        if pending:
+            yield pending.decode("utf-8", errors="surrogateescape")
+
+    def _parse_diff_tree(self, tokens: Iterator[str]) -> Iterator[tuple[str, dict[str, FileChange]]]:
+        """
+        Parses `git diff-tree -z --raw --numstat` output into per-commit file changes.
+
+        Each commit starts with its hash, followed by one raw record per file
+        (":<mode> <mode> <sha> <sha> <status>" then the path, or two paths for
+        renames) and one numstat record per file ("<added>\t<deleted>\t<path>",
+        with an empty path followed by two paths for renames).
+        """
+        commit_hash = None
+        changes = dict[str, FileChange]()
+        for token in tokens:
+            if token.startswith(":"):
+                _, mode, previous_blob_sha, blob_sha, status = token[1:].split(" ")
+                path = next(tokens)
+                if status[0] == "R":
+                    path = next(tokens)
+                changes[path] = FileChange(
+                    path=path,
+                    change_type=status[0],
+                    blob_sha=None if blob_sha == NULL_SHA else blob_sha,
+                    mode=mode,
+                    previous_blob_sha=None if previous_blob_sha == NULL_SHA else previous_blob_sha,
+                )
+            elif "\t" in token:
+                additions, deletions, path = token.split("\t", 2)
+                if not path:
+                    next(tokens)
+                    path = next(tokens)
+                change = changes.get(path)
+                if change is not None:
+                    # Binary files report '-' for both counts
+                    change.additions = int(additions) if additions != '-' else 0
+                    change.deletions = int(deletions) if deletions != '-' else 0
+            elif token:
+                if commit_hash is not None:
+                    yield commit_hash, changes
+                commit_hash = token
+                changes = dict[str, FileChange]()
+        if commit_hash is not None:
+            yield commit_hash, changes
+
+    def _parse_patch(self, stream: IO[bytes]) -> Iterator[tuple[str, dict[str, list[DiffHunk]]]]:
+        """
+        Parses `git diff-tree -p -U0` output into the changed hunks of each file per commit.
+
+        Hunk bodies are consumed by the line counts in their "@@" headers, so
+        changed lines that look like headers are not mistaken for them.
+        """
+        commit_hash = None
+        file_hunks = dict[str, list[DiffHunk]]()
+        path = None
+        hunk = None
+        for raw_line in stream:
+            line = raw_line.rstrip(b"\n").decode("utf-8", errors="surrogateescape")
+            if line.startswith("\\"):
+                # "\ No newline at end of file"
+                continue
+            if hunk is not None and (hunk.old_count > len(hunk.removed_lines) or hunk.new_count > len(hunk.added_lines)):
+                if line.startswith("-"):
+                    hunk.removed_lines.append(line[1:])
+                elif line.startswith("+"):
+                    hunk.added_lines.append(line[1:])
+                continue
+
+            hunk = None
+            if COMMIT_HASH_PATTERN.fullmatch(line):
+                if commit_hash is not None:
+                    yield commit_hash, file_hunks
+                commit_hash = line
+                file_hunks = dict[str, list[DiffHunk]]()
+                path = None
+            elif line.startswith("diff --git "):
+                path = None
+            elif line.startswith("+++ "):
+                path = self._patch_path(raw_line[4:].rstrip(b"\n"))
+            elif line.startswith("@@ ") and path is not None:
+                match = HUNK_HEADER_PATTERN.match(line)
+                if match is None:
                     continue
-                    
-                file_info = FileInfo(
-                    file_path=diff.b_path, 
-                    file_extension=diff.b_path.split('.')[-1], 
-                    line_count=line_count, 
-                    char_count=char_count, 
-                    additions=additions, 
-                    deletions=deletions, 
-                    content=content)
-                commit_details.files.update({diff.b_path: file_info})
-
-            return commit_details
-
-        except git.InvalidGitRepositoryError:
-            self.logger.error(f"Error: Invalid Git repository at {repo_path}")
-            return None
-        except git.BadName:
-            self.logger.error(f"Error: Invalid commit hash {commit_hash}")
+                old_start, old_count, new_start, new_count = match.groups()
+                hunk = DiffHunk(
+                    old_start=int(old_start),
+                    old_count=int(old_count) if old_count is not None else 1,
+                    new_start=int(new_start),
+                    new_count=int(new_count) if new_count is not None else 1,
+                )
+                file_hunks.setdefault(path, []).append(hunk)
+        if commit_hash is not None:
+            yield commit_hash, file_hunks
+
+    def _patch_path(self, raw_path: bytes) -> str | None:
+        # Git appends a tab to paths containing spaces and C-quotes paths with special characters
+        if raw_path.endswith(b"\t"):
+            raw_path = raw_path[:-1]
+        if raw_path == b"/dev/null":
             return None
-        
+        if raw_path.startswith(b'"') and raw_path.endswith(b'"'):
+            raw_path = codecs.escape_decode(raw_path[1:-1])[0]
+        return raw_path.decode("utf-8", errors="surrogateescape").removeprefix("b/")
+
+    def _fill_files(self, repo_path, commit_details: CommitDetails, changes: dict[str, FileChange], hunks: dict[str, list[DiffHunk]] | None = None, load_content: bool = True):
+        # In hunk mode contents are only loaded on demand by the import tracker
+        read_content = hunks is None and load_content
+        # A cat-file process is only started when contents are read here
+        reader = blob_reader_pool.get(repo_path) if read_content else None
+        max_bytes = Config.BLOB_HEADER_BYTES if Config.BLOB_HEADER_ONLY else Config.BLOB_MAX_BYTES
+        for path, change in changes.items():
+            # Renamed files are not counted as new work
+            if change.change_type == "R":
+                continue
+            content = ""
+            line_count = 0
+            char_count = 0
+            # Submodule entries point at commits in another repository
+            blob_sha = change.blob_sha if change.mode != SUBMODULE_MODE else None
+            if blob_sha is not None and read_content:
+                blob = reader.read(blob_sha, max_bytes)
+                if blob is not None:
+                    content = blob.data.decode('utf-8', errors='ignore')
+                    line_count = blob.line_count
+                    # Truncated blobs only know their size in bytes
+                    char_count = blob.size if blob.truncated else len(content)
+
+            file_info = FileInfo(
+                file_path=path,
+                file_extension=path.split('.')[-1],
+                line_count=line_count,
+                char_count=char_count,
+                additions=change.additions,
+                deletions=change.deletions,
+                content=content,
+                blob_sha=blob_sha,
+                previous_blob_sha=change.previous_blob_sha,
+                hunks=hunks.get(path, []) if hunks is not None else None)
+            commit_details.files.update({path: file_info})
+
     def clone_repo(self, repo_url) -> str | None:
-        # --- START MODIFICATION ---
-        # Check if the destination path exists
-        base_dir = Config.BASE_DIR
-        repo_path = repo_url.replace("https://github.com/", base_dir + "/")
-        clone_url = repo_url + ".git"
-        if os.path.exists(repo_path):
-            self.logger.info(f"Directory '{repo_path}' already exists. Removing it...")
-            try:
-                # Use shutil.rmtree to remove the directory and all its contents
-                shutil.rmtree(repo_path)
-                self.logger.info(f"Successfully removed directory '{repo_path}'.")
-            except OSError as e:
-                # Handle potential errors during removal (e.g., permissions)
-                self.logger.error(f"Error removing directory '{repo_path}': {e}")
-                return None # Cannot proceed if removal fails
-        # --- END MODIFICATION ---
-        repo = git.Repo.clone_from(clone_url, repo_path)
-        return repo_path
+        """
+        Returns the path of the cached bare mirror of the repository.
+        The mirror is cloned on first use and incrementally fetched afterwards.
+        It has no working tree; use create_worktree when files are needed on disk.
+        """
+        return repo_cache.acquire(repo_url)
+
+    def create_worktree(self, repo_path) -> str | None:
+        """Creates an empty worktree of the mirror at repo_path for checking out commits."""
+        return repo_cache.add_worktree(repo_path)
 
     def checkout_commit(self, repo_path, commit_hash):
         repo = git.Repo(repo_path)
         repo.git.checkout(commit_hash)
         return repo
-    
+
+    def delete_worktree(self, worktree_path):
+        repo_cache.remove_worktree(worktree_path)
+
     def delete_repo(self, repo_path):
-        shutil.rmtree(repo_path)
+        """Releases the mirror handed out by clone_repo; the mirror stays cached."""
+        if repo_cache.release(repo_path):
+            blob_reader_pool.close(repo_path)
 
 local_git_util = LocalGitUtil()
\ No newline at end of file
@@ -40,7 +40,11 @@ class MetricsUtil:
         return experience_metrics
     
     def get_quality_metrics(self, commit_details: CommitDetails, exclude_files: list, repo_path: str) -> CommitQualityMetrics | None:
-        success, error = quality_scan.analyze_commit_files(commit_details.hash, repo_path)
+        inclusions = self.get_scan_inclusions(commit_details, exclude_files)
+        if inclusions is not None and len(inclusions) == 0:
+            return self.collect_quality_metrics(commit_details, scanned=False)
+
+        success, error = quality_scan.analyze_commit_files(commit_details.hash, repo_path, inclusions)
         if error:
             self.logger.error(error)
             return None
@@ -49,7 +53,37 @@ class MetricsUtil:
             self.logger.info("Analysis failed or results not available")
             return None
 
-        code_quality_per_file = quality_scan.get_quality_metrics_for_files(Config.BASE_DIR, commit_details.hash, [])
+        return self.collect_quality_metrics(commit_details)
+
+    def get_scan_inclusions(self, commit_details: CommitDetails, exclude_files: list) -> list[str] | None:
+        """
+        Returns the paths a quality scan of the commit is restricted to, or None to scan the whole
+        repository. An empty list means none of the commit's files can be scanned.
+        """
+        if not Config.QUALITY_SCAN_CHANGED_FILES_ONLY:
+            return None
+        # Only files of the commit are used for the metrics, so the rest of the repository isn't scanned
+        excluded_paths = {file.file_path for file in exclude_files}
+        return [
+            file_path for file_path, file in commit_details.files.items()
+            # Deleted files aren't in the checkout
+            if file_path not in excluded_paths and file.blob_sha is not None
+        ]
+
+    def collect_quality_metrics(self, commit_details: CommitDetails, scanned: bool = True) -> CommitQualityMetrics:
+        """
+        Builds the quality metrics of a commit from the measures of its finished scan.
+
+        Args:
+            commit_details: The scanned commit.
+            scanned: False when none of the commit's files could be scanned, so there are no measures to read.
+        """
+        if not scanned:
+            self.logger.info(f"No files of commit {commit_details.hash} can be scanned, skipping the quality scan")
+            code_quality_per_file = []
+        else:
+            # Measures are streamed page by page, keeping only the files of the commit
+            code_quality_per_file = quality_scan.iter_quality_metrics_for_files(Config.BASE_DIR, commit_details.hash, [], commit_details.files.keys())
         
         commit_quality_metrics = CommitQualityMetrics(
             skills=set(),
@@ -0,0 +1,54 @@
+import queue
+import threading
+from typing import Any, Callable
+from utils.logging_util import logging_util
+
+# Queued after the last item to tell a worker to exit
+_STOP = object()
+
+
+class PipelineStage:
+    """
+    A pool of worker threads handling the items of one bounded queue.
+
+    Handlers pass their output on by putting it into the next stage, so a
+    full downstream queue blocks the upstream workers instead of letting
+    work pile up in memory. A handler that raises is logged and the worker
+    moves on to the next item.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], None], worker_count: int, queue_size: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.name = name
+        self.handler = handler
+        self.worker_count = max(1, worker_count)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._workers = list[threading.Thread]()
+
+    def start(self):
+        for index in range(self.worker_count):
+            worker = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def put(self, item: Any):
+        """Queues an item, blocking while the queue is full."""
+        self._queue.put(item)
+
+    def close(self):
+        """Waits for every queued item to be handled and stops the workers. Upstream stages must be closed first."""
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers.clear()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                self.logger.error(f"Error in {self.name} stage: {str(e)}", exc_info=True)
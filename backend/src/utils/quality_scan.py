@@ -1,25 +1,60 @@
 import subprocess
 import os
 import tempfile
-import config
 from core.models import FileQualityMetrics
-import requests
 from config import Config
-from utils.local_git_util import local_git_util
-from utils.github_util import github_util
-import time
+from utils.ce_task_waiter import ce_task_waiter
+from utils.http_sessions import http_sessions
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
 from utils.logging_util import logging_util
 
+COMPONENT_TREE_METRICS = [
+    "bugs", "vulnerabilities", "code_smells",
+    "reliability_rating", "security_rating", "sqale_rating",
+    "coverage", "duplicated_lines_density","complexity" 
+]
+# Largest page size the component_tree endpoint allows
+COMPONENT_TREE_PAGE_SIZE = 500
+
 class QualityScan:
     def __init__(self):
         self.logger = logging_util.get_logger(__name__)
     
-    def analyze_commit_files(self, commit_hash, repo_path):
+    def analyze_commit_files(self, commit_hash, repo_path, inclusions: Optional[list[str]] = None):
         """
         Analyzes commit files and waits for results to be available
+        Args:
+            commit_hash: Commit checked out in repo_path.
+            repo_path: Directory to scan.
+            inclusions: Paths relative to repo_path to restrict the scan to; the whole directory is scanned when None.
         Returns:
             tuple: (success_status, error_message)
         """
+        task_id, error = self.start_scan(commit_hash, repo_path, inclusions)
+        if error:
+            return None, error
+
+        # Wait for analysis to complete using CE API
+        if not ce_task_waiter.wait(task_id).result():
+            return None, "Analysis task did not complete successfully"
+
+        return True, None
+
+    def start_scan(self, commit_hash, repo_path, inclusions: Optional[list[str]] = None) -> tuple[Optional[str], Optional[str]]:
+        """
+        Runs the scanner on repo_path and returns once the report has been submitted,
+        without waiting for the server to process it; use ce_task_waiter for that.
+        The directory can be reused as soon as this returns.
+        Returns:
+            tuple: (task_id, error_message)
+        """
+        if inclusions is not None and len(inclusions) == 0:
+            # An empty sonar.inclusions doesn't restrict anything, so the whole directory would be scanned
+            return None, f"No files to scan in commit {commit_hash}"
+
         if Config.SONAR_CLOUD_TOKEN is not None and Config.SONAR_CLOUD_TOKEN != "":
             cmd = [
                 "sonar-scanner",
@@ -44,14 +79,22 @@ class QualityScan:
                 f'-Dsonar.scm.disabled=true',
             ]
 
-        # Run SonarScanner
-        result = subprocess.run(
-            cmd,
-            cwd=repo_path,
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        with tempfile.TemporaryDirectory() as settings_dir:
+            if inclusions is not None:
+                # The list can be too long for a command line argument, so it is passed in a settings file
+                settings_path = os.path.join(settings_dir, "sonar-project.properties")
+                with open(settings_path, "w", encoding="ascii") as settings_file:
+                    settings_file.write(f"sonar.inclusions={self._escape_property(self._inclusion_patterns(inclusions))}\n")
+                cmd.append(f'-Dproject.settings={settings_path}')
+
+            # Run SonarScanner
+            result = subprocess.run(
+                cmd,
+                cwd=repo_path,
+                capture_output=True,
+                text=True,
+                check=False
+            )
         
         if result.returncode != 0:
             self.logger.error(f"SonarQube scanner failed with exit code {result.returncode}")
@@ -71,108 +114,116 @@ class QualityScan:
             self.logger.error(result.stdout)
             return None, "Could not find task ID in scanner output"
 
-        # Wait for analysis to complete using CE API
-        if not self._wait_for_task_completion(task_id):
-            return None, "Analysis task did not complete successfully"
+        return task_id, None
 
-        return True, None
+    def _inclusion_patterns(self, paths: list[str]) -> str:
+        # Patterns are separated by commas, so a comma in a path is matched with a single-character wildcard
+        return ",".join(path.replace(",", "?") for path in paths)
 
-    def _wait_for_task_completion(self, task_id: str, max_retries: int = 10, delay: int = 1) -> bool:
+    def _escape_property(self, value: str) -> str:
+        # Properties files are read as ISO-8859-1, so anything else is written as UTF-16 unicode escapes
+        escaped = value.replace("\\", "\\\\")
+        result = []
+        for char in escaped:
+            if 32 <= ord(char) < 127:
+                result.append(char)
+                continue
+            utf16 = char.encode("utf-16-be")
+            result.extend(f"\\u{int.from_bytes(utf16[i:i + 2], 'big'):04x}" for i in range(0, len(utf16), 2))
+        return "".join(result)
+
+    def get_quality_metrics_for_files(self, temp_repo_dir_path: str, commit_hash: str, excluded_files: list[str]) -> list[FileQualityMetrics]:
+        return list(self.iter_quality_metrics_for_files(temp_repo_dir_path, commit_hash, excluded_files))
+
+    def iter_quality_metrics_for_files(self,
+                                       temp_repo_dir_path: str,
+                                       commit_hash: str,
+                                       excluded_files: list[str],
+                                       file_paths: Optional[Iterable[str]] = None) -> Iterator[FileQualityMetrics]:
         """
-        Wait for analysis task to complete using CE API
+        Yields the quality metrics of every file in a commit's scan, page by page.
+
+        The first page tells how many pages there are; the rest are fetched a few at a
+        time in parallel and yielded in order, so only those pages are held in memory.
+        Args:
+            temp_repo_dir_path: Prefix stripped from the component paths.
+            commit_hash: Commit whose scan to read.
+            excluded_files: Paths to leave out.
+            file_paths: If given, only these paths are yielded.
         """
-        headers = {
-            "Authorization": f"Bearer {Config.SONAR_CLOUD_TOKEN if Config.SONAR_CLOUD_TOKEN else Config.SONARQUBE_TOKEN}"
-        }
-        
-        for attempt in range(max_retries):
+        wanted_paths = set(file_paths) if file_paths is not None else None
+        excluded_paths = set(excluded_files)
+
+        page = self._get_component_tree_page(commit_hash, 1)
+        page_count = math.ceil(page.get("paging", {}).get("total", 0) / COMPONENT_TREE_PAGE_SIZE)
+        concurrency = max(1, Config.SONAR_MEASURES_CONCURRENCY)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            next_page = 2
+            in_flight = deque()
             try:
-                response = requests.get(
-                    f"{Config.SONARQUBE_URL}/api/ce/task",
-                    params={"id": task_id},
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    task_data = response.json()["task"]
-                    status = task_data["status"]
-                    
-                    self.logger.info(f"Analysis status: {status} (attempt {attempt + 1}/{max_retries})")
-                    
-                    if status == "SUCCESS":
-                        return True
-                    elif status in ["FAILED", "CANCELED"]:
-                        self.logger.error(f"Analysis failed with status: {status}")
-                        return False
-                    
-                time.sleep(delay)
-                
-            except Exception as e:
-                self.logger.error(f"Error checking task status: {str(e)}", exc_info=True)
-                time.sleep(delay)
-        
-        return False
+                while page is not None:
+                    # Keep the next few pages downloading while the current one is handed out
+                    while next_page <= page_count and len(in_flight) < concurrency:
+                        in_flight.append(executor.submit(self._get_component_tree_page, commit_hash, next_page))
+                        next_page += 1
+                    for component in page.get("components", []):
+                        # Only process files (not directories)
+                        if component["qualifier"] != "FIL":
+                            continue
+                        file_path = component["path"].replace(temp_repo_dir_path, "")
+                        if file_path in excluded_paths or (wanted_paths is not None and file_path not in wanted_paths):
+                            continue
+                        yield self._to_file_quality_metrics(file_path, component)
+                    page = in_flight.popleft().result() if in_flight else None
+            finally:
+                # The consumer may stop early; pages that haven't started aren't fetched
+                for future in in_flight:
+                    future.cancel()
 
-    def get_quality_metrics_for_files(self, temp_repo_dir_path: str, commit_hash: str, excluded_files: list[str]) -> list[FileQualityMetrics]:
-        # Get the quality metrics for the file
+    def _get_component_tree_page(self, commit_hash: str, page: int) -> dict:
         url = f"{Config.SONARQUBE_URL}/api/measures/component_tree"
-        metrics = [
-            "bugs", "vulnerabilities", "code_smells",
-            "reliability_rating", "security_rating", "sqale_rating",
-            "coverage", "duplicated_lines_density","complexity" 
-        ]
-
         params = {
             "component": f"commit_{commit_hash}",
-            "metricKeys": ",".join(metrics),
+            "metricKeys": ",".join(COMPONENT_TREE_METRICS),
             "qualifiers": "FIL",
             "strategy": "leaves",
-            "ps": 500
+            "ps": COMPONENT_TREE_PAGE_SIZE,
+            "p": page
         }
         headers = {}
         if Config.SONAR_CLOUD_TOKEN is not None and Config.SONAR_CLOUD_TOKEN != "":
             headers["Authorization"] = f"Bearer {Config.SONAR_CLOUD_TOKEN}"
         else:
             headers["Authorization"] = f"Bearer {Config.SONARQUBE_USER_TOKEN}"
-        response = requests.get(url,  params=params, headers=headers)
+        # Pages are fetched in parallel over the pooled keep-alive connections to the server
+        response = http_sessions.get(url,  params=params, headers=headers)
         if response.status_code != 200:
             raise Exception(f"API request failed: {response.text}")
-        result = response.json()
-        file_metrics = list[FileQualityMetrics]()
-        
-        for component in result.get("components", []):
-            # Only process files (not directories)
-            if component["qualifier"] != "FIL":
-                continue
-            # print(component)
-            file_path = component["path"].replace(temp_repo_dir_path, "")
-            if file_path in excluded_files:
-                continue
+        return response.json()
 
-            file_quality_metrics = FileQualityMetrics(file_path, None, None, None, None, None, None, None, None, None)
-            # Extract metrics for this file
-            for measure in component.get("measures", []):
-                if measure["metric"] == "bugs":
-                    file_quality_metrics.bugs = measure["value"]
-                elif measure["metric"] == "vulnerabilities":
-                    file_quality_metrics.vulnerabilities = measure["value"]
-                elif measure["metric"] == "code_smells":
-                    file_quality_metrics.code_smells = measure["value"]
-                elif measure["metric"] == "duplicated_lines_density":
-                    file_quality_metrics.duplicated_lines_density = measure["value"]
-                elif measure["metric"] == "coverage":
-                    file_quality_metrics.coverage = measure["value"]
-                elif measure["metric"] == "sqale_rating":
-                    file_quality_metrics.maintainability_rating = measure["value"]
-                elif measure["metric"] == "reliability_rating":
-                    file_quality_metrics.reliability_rating = measure["value"]
-                elif measure["metric"] == "security_rating":
-                    file_quality_metrics.security_rating = measure["value"]
-                elif measure["metric"] == "complexity":
-                    file_quality_metrics.complexity = measure["value"]
-                                        
-            file_metrics.append(file_quality_metrics)
-            
-        return file_metrics
+    def _to_file_quality_metrics(self, file_path: str, component: dict) -> FileQualityMetrics:
+        file_quality_metrics = FileQualityMetrics(file_path, None, None, None, None, None, None, None, None, None)
+        # Extract metrics for this file
+        for measure in component.get("measures", []):
+            if measure["metric"] == "bugs":
+                file_quality_metrics.bugs = measure["value"]
+            elif measure["metric"] == "vulnerabilities":
+                file_quality_metrics.vulnerabilities = measure["value"]
+            elif measure["metric"] == "code_smells":
+                file_quality_metrics.code_smells = measure["value"]
+            elif measure["metric"] == "duplicated_lines_density":
+                file_quality_metrics.duplicated_lines_density = measure["value"]
+            elif measure["metric"] == "coverage":
+                file_quality_metrics.coverage = measure["value"]
+            elif measure["metric"] == "sqale_rating":
+                file_quality_metrics.maintainability_rating = measure["value"]
+            elif measure["metric"] == "reliability_rating":
+                file_quality_metrics.reliability_rating = measure["value"]
+            elif measure["metric"] == "security_rating":
+                file_quality_metrics.security_rating = measure["value"]
+            elif measure["metric"] == "complexity":
+                file_quality_metrics.complexity = measure["value"]
+        return file_quality_metrics
 
 quality_scan = QualityScan()
@@ -0,0 +1,186 @@
+import os
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+import git
+from config import Config
+from utils.logging_util import logging_util
+
+
+class RepoCache:
+    """
+    Keeps bare mirrors of analyzed repositories on disk and hands out
+    per-analysis worktrees.
+
+    Mirrors are refreshed with an incremental fetch instead of being cloned
+    again, and are evicted least-recently-used first once the cache grows
+    past its size quota whenever a new mirror is cloned. Mirrors with an
+    active lease are never evicted.
+    """
+
+    def __init__(self, cache_dir: str, worktree_dir: str, max_bytes: int):
+        self.logger = logging_util.get_logger(__name__)
+        self.cache_dir = cache_dir
+        self.worktree_dir = worktree_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._repo_locks = dict[str, threading.Lock]()
+        # Threads holding or waiting for each repo lock; locks are dropped once unused
+        self._repo_lock_users = defaultdict[str, int](int)
+        self._leases = defaultdict[str, int](int)
+        self._worktrees = dict[str, str]()
+
+    def _mirror_path(self, repo_url: str) -> str:
+        name = repo_url.replace(Config.GITHUB_REPO_BASE_URL, "").strip("/")
+        return os.path.join(self.cache_dir, name + ".git")
+
+    @contextmanager
+    def _repo_lock(self, mirror_path: str) -> Iterator[None]:
+        """Holds the lock of one mirror; the lock only exists while threads hold or wait for it."""
+        with self._lock:
+            lock = self._repo_locks.get(mirror_path)
+            if lock is None:
+                lock = threading.Lock()
+                self._repo_locks[mirror_path] = lock
+            self._repo_lock_users[mirror_path] += 1
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                self._repo_lock_users[mirror_path] -= 1
+                if self._repo_lock_users[mirror_path] == 0:
+                    del self._repo_lock_users[mirror_path]
+                    del self._repo_locks[mirror_path]
+
+    def acquire(self, repo_url: str) -> str | None:
+        """
+        Returns the path of an up-to-date bare mirror for the repository,
+        cloning it on first use and fetching new refs otherwise.
+
+        Every successful call must be paired with a call to release().
+        """
+        mirror_path = self._mirror_path(repo_url)
+        cloned = False
+        with self._repo_lock(mirror_path):
+            try:
+                if os.path.exists(mirror_path):
+                    self.logger.info(f"Refreshing mirror '{mirror_path}'")
+                    git.Repo(mirror_path).git.fetch("origin", "--prune", "--tags")
+                else:
+                    self.logger.info(f"Cloning mirror of {repo_url} into '{mirror_path}'")
+                    repo = git.Repo.clone_from(repo_url + ".git", mirror_path, bare=True)
+                    # Bare clones don't configure a fetch refspec, so later fetches would not update branches
+                    repo.git.config("remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+                    cloned = True
+                os.utime(mirror_path)
+            except (git.GitCommandError, git.InvalidGitRepositoryError, git.NoSuchPathError, OSError) as e:
+                self.logger.error(f"Error updating mirror for {repo_url}: {e}")
+                return None
+            with self._lock:
+                self._leases[mirror_path] += 1
+
+        # Walking the cache is expensive, so the quota is only checked when a mirror was added
+        if cloned:
+            self.evict()
+        return mirror_path
+
+    def release(self, mirror_path: str) -> bool:
+        """Releases one lease on the mirror. Returns True if it was the last one."""
+        with self._lock:
+            self._leases[mirror_path] -= 1
+            last_lease = self._leases[mirror_path] <= 0
+            if last_lease:
+                del self._leases[mirror_path]
+        if os.path.exists(mirror_path):
+            os.utime(mirror_path)
+        return last_lease
+
+    def add_worktree(self, mirror_path: str) -> str | None:
+        """
+        Creates a detached worktree of the mirror without checking out any files.
+        Callers check out the commits they need themselves.
+        """
+        name = os.path.relpath(mirror_path, self.cache_dir).removesuffix(".git")
+        worktree_path = os.path.join(self.worktree_dir, f"{name}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(os.path.dirname(worktree_path), exist_ok=True)
+        with self._repo_lock(mirror_path):
+            try:
+                git.Repo(mirror_path).git.worktree("add", "--detach", "--no-checkout", worktree_path)
+            except git.GitCommandError as e:
+                self.logger.error(f"Error creating worktree for '{mirror_path}': {e}")
+                return None
+        with self._lock:
+            self._worktrees[worktree_path] = mirror_path
+        return worktree_path
+
+    def remove_worktree(self, worktree_path: str):
+        with self._lock:
+            mirror_path = self._worktrees.pop(worktree_path, None)
+        shutil.rmtree(worktree_path, ignore_errors=True)
+        if mirror_path is None or not os.path.exists(mirror_path):
+            return
+        with self._repo_lock(mirror_path):
+            try:
+                git.Repo(mirror_path).git.worktree("prune")
+            except git.GitCommandError as e:
+                self.logger.warning(f"Error pruning worktrees of '{mirror_path}': {e}")
+
+    def _list_mirrors(self) -> list[str]:
+        mirrors = []
+        if not os.path.isdir(self.cache_dir):
+            return mirrors
+        for owner in os.listdir(self.cache_dir):
+            owner_dir = os.path.join(self.cache_dir, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for name in os.listdir(owner_dir):
+                if name.endswith(".git"):
+                    mirrors.append(os.path.join(owner_dir, name))
+        return mirrors
+
+    def _dir_size(self, path: str) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, file_name))
+                except OSError:
+                    continue
+        return total
+
+    def _mtime(self, path: str) -> float | None:
+        try:
+            return os.path.getmtime(path)
+        except FileNotFoundError:
+            # Evicted by another thread since the cache was listed
+            return None
+
+    def evict(self):
+        """Removes least-recently-used mirrors until the cache fits in its quota."""
+        mtimes = {mirror: self._mtime(mirror) for mirror in self._list_mirrors()}
+        mirrors = [mirror for mirror, mtime in mtimes.items() if mtime is not None]
+        sizes = {mirror: self._dir_size(mirror) for mirror in mirrors}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        for mirror in sorted(mirrors, key=mtimes.get):
+            if total <= self.max_bytes:
+                break
+            with self._repo_lock(mirror):
+                with self._lock:
+                    if self._leases.get(mirror, 0) > 0:
+                        continue
+                self.logger.info(f"Evicting mirror '{mirror}' ({sizes[mirror]} bytes)")
+                shutil.rmtree(mirror, ignore_errors=True)
+            total -= sizes[mirror]
+
+        if total > self.max_bytes:
+            self.logger.warning(f"Repository cache is {total} bytes, above its {self.max_bytes} byte quota, but all remaining mirrors are in use")
+
+
+repo_cache = RepoCache(Config.REPO_CACHE_DIR, Config.REPO_WORKTREE_DIR, Config.REPO_CACHE_MAX_BYTES)
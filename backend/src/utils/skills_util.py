@@ -1,5 +1,13 @@
-from core.models import CommitDetails, FileInfo
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from config import Config
+from core.models import BlobDetection, CommitDetails, FileInfo
+from utils import detection_worker
+from utils.blob_reader import blob_reader_pool
+from utils.detection_cache import detection_cache
 from utils.framework_detector import framework_detector
+from utils.hunk_import_tracker import HunkImportTracker
 from utils.logging_util import logging_util
 
 extension_to_language = {
@@ -67,6 +75,8 @@ class SkillsUtil:
     def __init__(self):
         self.logger = logging_util.get_logger(__name__)
         # Replace print statements in initialization
+        self._process_pool = None
+        self._process_pool_lock = threading.Lock()
 
     def convert_file_info(self, file: FileInfo) -> FileInfo:
         return FileInfo(
@@ -78,7 +88,10 @@ class SkillsUtil:
             deletions=file.deletions,
             language=file.language,
             frameworks=file.frameworks,
-            content=file.content
+            content=file.content,
+            blob_sha=file.blob_sha,
+            previous_blob_sha=file.previous_blob_sha,
+            hunks=file.hunks
         )
 
     def identify_language(self, file: FileInfo) -> str | None:
@@ -86,26 +99,139 @@ class SkillsUtil:
         return extension_to_language.get(extension.lower(), "Unknown")
     
     def identify_skills(self, commit_details: CommitDetails) -> tuple[CommitDetails, list[str], list[str]]:
-        languages = set[str]()
-        frameworks = set[str]()
-        for file_path, file in commit_details.files.items():
+        return self.identify_skills_for_commits([commit_details])[0]
+
+    def identify_skills_for_commits(self, commits: list[CommitDetails], import_tracker: HunkImportTracker | None = None, repo_path: str | None = None) -> list[tuple[CommitDetails, list[str], list[str]]]:
+        """
+        Identifies the languages and frameworks of many commits at once.
+
+        Cache lookups and framework scoring run as one batch over the files of
+        all the commits, and each unique blob is only detected once.
+
+        Args:
+            commits: The commits to inspect, in chronological order.
+            import_tracker: Finds imports from diff hunks for files that carry them
+                instead of from their full content.
+            repo_path: Repository the commits come from. When set and the process pool
+                is enabled, blobs are detected in worker processes that read them by id.
+
+        Returns:
+            list: (commit_details, languages, frameworks) per commit, in the same order.
+        """
+        files = [file for commit_details in commits for file in commit_details.files.values()]
+        for file in files:
             file.language = self.identify_language(file)
-            if file.language is not None and file.language != "Unknown":
-                languages.add(file.language)
-        
-
-        for file in commit_details.files.values():
-            detector_file = self.convert_file_info(file)
-            detected_frameworks = framework_detector.process_file_info(detector_file).frameworks
-            if detected_frameworks is not None and len(detected_frameworks) > 0:
-                # print('commit', commit_details.hash, 'file', file.file_path, 'detected_frameworks', detected_frameworks)
-                frameworks.update(detected_frameworks)
-                file.frameworks = detected_frameworks
-
-        return commit_details, list(languages), list(frameworks)
-    
+
+        # Detection results are cached per blob, so only contents not seen before are scanned
+        keys = list({(file.blob_sha, file.file_extension) for file in files if file.blob_sha is not None})
+        detector_version = detection_cache.version(framework_detector.DETECTOR_VERSION)
+        detections = detection_cache.get_many(keys, detector_version)
+
+        detector_files = dict[tuple[str, str], FileInfo]()
+        for file in files:
+            key = (file.blob_sha, file.file_extension)
+            if file.blob_sha is not None and key not in detections and key not in detector_files:
+                detector_files[key] = self.convert_file_info(file)
+
+        inline_files = list[FileInfo]()
+        imports_list = list[set[str]]()
+        pooled_files = list[FileInfo]()
+        # Results from an incremental hunk update depend on the file's history, so only full parses are cached
+        cacheable = dict[tuple[str, str], bool]()
+        for key, file in detector_files.items():
+            cacheable[key] = True
+            if import_tracker is not None and file.hunks is not None:
+                tracked = import_tracker.track(file)
+                file.content = tracked.content
+                inline_files.append(file)
+                imports_list.append(tracked.imports)
+                cacheable[key] = tracked.full_parse
+            elif repo_path is not None and self.detects_in_processes:
+                pooled_files.append(file)
+            else:
+                inline_files.append(file)
+                imports_list.append(framework_detector.find_imports(file))
+
+        # Worker processes start on their share before the inline files are scored here
+        pooled_futures = self._submit_to_processes(repo_path, pooled_files)
+        results = dict[tuple[str, str], tuple[list[str], list[str]]]()
+        frameworks_list = framework_detector.detect_frameworks_batch(inline_files, imports_list)
+        for file, imports, detected_frameworks in zip(inline_files, imports_list, frameworks_list):
+            results[(file.blob_sha, file.file_extension)] = (sorted(imports), detected_frameworks)
+        for chunk, future in pooled_futures:
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                # A crashed worker breaks the whole pool; detect the chunk in this process instead,
+                # with the pooled reader that is closed along with the repository
+                self.logger.error(f"Error detecting skills in worker process: {e}")
+                chunk_results = detection_worker.detect_blobs(repo_path, self._blob_tasks(chunk), blob_reader_pool.get(repo_path))
+            for file, result in zip(chunk, chunk_results):
+                results[(file.blob_sha, file.file_extension)] = result
+
+        new_detections = [
+            BlobDetection(
+                blob_sha=key[0],
+                file_extension=key[1],
+                language=detector_files[key].language,
+                imports=imports,
+                frameworks=detected_frameworks,
+                detector_version=detector_version
+            )
+            for key, (imports, detected_frameworks) in results.items()
+        ]
+        detection_cache.put_many([
+            detection for detection in new_detections if cacheable[(detection.blob_sha, detection.file_extension)]
+        ])
+        detections.update({(detection.blob_sha, detection.file_extension): detection for detection in new_detections})
+
+        results = []
+        for commit_details in commits:
+            languages = set[str]()
+            frameworks = set[str]()
+            for file in commit_details.files.values():
+                if file.language is not None and file.language != "Unknown":
+                    languages.add(file.language)
+                # Files without a blob (deletions, submodules) have no content to detect frameworks in
+                detection = detections.get((file.blob_sha, file.file_extension))
+                if detection is not None and len(detection.frameworks) > 0:
+                    # print('commit', commit_details.hash, 'file', file.file_path, 'detected_frameworks', detection.frameworks)
+                    frameworks.update(detection.frameworks)
+                    file.frameworks = list(detection.frameworks)
+            results.append((commit_details, list(languages), list(frameworks)))
+        return results
+
+    @property
+    def detects_in_processes(self) -> bool:
+        """Whether blobs are detected in worker processes, which read the contents themselves."""
+        return Config.SKILLS_PROCESS_WORKERS > 0
+
+    def _submit_to_processes(self, repo_path: str | None, files: list[FileInfo]) -> list[tuple[list[FileInfo], Future]]:
+        if not files:
+            return []
+        pool = self._get_process_pool()
+        chunk_size = Config.SKILLS_PROCESS_CHUNK_SIZE
+        chunks = [files[start:start + chunk_size] for start in range(0, len(files), chunk_size)]
+        return [(chunk, pool.submit(detection_worker.detect_blobs, repo_path, self._blob_tasks(chunk))) for chunk in chunks]
+
+    def _blob_tasks(self, files: list[FileInfo]) -> list[tuple[str, str, str]]:
+        # Only blob ids cross the process boundary; workers read the contents from the repository
+        return [(file.blob_sha, file.file_extension, file.language) for file in files]
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                # Spawned workers start clean instead of inheriting this process' threads, locks and connections
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=Config.SKILLS_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=detection_worker.init_worker
+                )
+            return self._process_pool
+
     def identify_excluded_files(self, commit_details: CommitDetails) -> list[FileInfo]:
-        return [file for _, file in commit_details.files.items() if file.language is None]
+        # Files in a language we don't know have no skills to attribute metrics to
+        return [file for _, file in commit_details.files.items() if file.language is None or file.language == "Unknown"]
         # return [file for file in commit_details.files if file.language is None]
 
 
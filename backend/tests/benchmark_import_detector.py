@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the import scanners on large generated source files.
+
+Times the original line-by-line scanner against the compiled regex scanner,
+with the early exit on and off, for every language with import keywords.
+It isn't collected by pytest; run it from the backend directory:
+
+    python tests/benchmark_import_detector.py [--lines N] [--runs N]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+os.environ.setdefault("GITHUB_ACCESS_TOKEN", "benchmark")
+
+from utils.import_detector import ImportDetector  # noqa: E402
+from test_import_detector import find_imports_by_line  # noqa: E402
+
+# (import line, line that ends the import block, body line) per language; {i} is the line's index
+SOURCE_TEMPLATES = {
+    "Python": ("import package_{i}.module", "def handler_0(request):", "    value_{i} = request.get('key_{i}')"),
+    "Java": ("import com.example.pkg{i}.Type;", "public class Service {", "    int value{i} = compute({i});"),
+    "Kotlin": ("import com.example.pkg{i}.Type", "class Service {", "    val value{i} = compute({i})"),
+    "JavaScript": ("import mod{i} from 'package-{i}';", "function main() {", "  const value{i} = compute({i});"),
+    "TypeScript": ("import {{ Type{i} }} from 'package-{i}';", "export class Service {", "  value{i}: number = compute({i});"),
+    "Go": ("import \"example.com/pkg{i}\"", "func main() {", "\tvalue{i} := compute({i})"),
+    "Rust": ("use crate_{i}::module;", "fn main() {", "    let value_{i} = compute({i});"),
+    "PHP": ("use App\\Package{i}\\Type;", "class Service {", "    $value{i} = compute({i});"),
+    "Ruby": ("require 'gem_{i}'", "class Service", "  value_{i} = compute({i})"),
+    "Dart": ("import 'package:pkg{i}/pkg{i}.dart';", "class Service {", "  var value{i} = compute({i});"),
+    "C#": ("using Example.Package{i};", "public class Service {", "    int value{i} = Compute({i});"),
+}
+IMPORT_LINES = 30
+
+
+def generate_source(language: str, body_lines: int) -> str:
+    """An import header followed by a long body, with a comment every tenth line."""
+    import_line, block_end, body_line = SOURCE_TEMPLATES[language]
+    lines = [import_line.format(i=i) for i in range(IMPORT_LINES)]
+    lines.append(block_end)
+    for i in range(body_lines):
+        lines.append("// " + body_line.format(i=i).strip() if i % 10 == 0 else body_line.format(i=i))
+    return "\n".join(lines) + "\n"
+
+
+def time_scan(scan, runs: int) -> float:
+    """Best of runs, in microseconds per file."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        scan()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=5000, help="body lines per generated file")
+    parser.add_argument("--runs", type=int, default=50, help="timed runs per scanner")
+    args = parser.parse_args()
+
+    full_scan = ImportDetector(early_exit=False)
+    early_exit = ImportDetector(early_exit=True)
+    print(f"{'language':<12}{'line-by-line':>14}{'regex':>10}{'early exit':>12}{'speedup':>10}{'early':>8}  (us per file)")
+    for language in SOURCE_TEMPLATES:
+        source = generate_source(language, args.lines)
+        expected = find_imports_by_line(source, language)
+        if full_scan.find_imports_for_language(source, language) != expected:
+            raise SystemExit(f"{language}: regex scanner disagrees with the line-by-line scanner")
+        line_by_line = time_scan(lambda: find_imports_by_line(source, language), args.runs)
+        regex = time_scan(lambda: full_scan.find_imports_for_language(source, language), args.runs)
+        early = time_scan(lambda: early_exit.find_imports_for_language(source, language), args.runs)
+        print(f"{language:<12}{line_by_line:>14.1f}{regex:>10.1f}{early:>12.1f}{line_by_line / regex:>9.1f}x{line_by_line / early:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
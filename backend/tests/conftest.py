@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import git
+import mongomock
+import mongomock.collection
+import pymongo
+import pytest
+
+# Modules import each other from the src root, e.g. `from config import Config`
+src_dir = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_dir))
+
+# Repository mirrors and worktrees go under BASE_DIR
+os.environ.setdefault("BASE_DIR", tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.setdefault("GITHUB_ACCESS_TOKEN", "test-token")
+
+# The db module connects on import; tests run against an in-memory MongoDB instead
+pymongo.MongoClient = mongomock.MongoClient
+
+# pymongo 4.11+ passes a sort option with bulk updates, which mongomock doesn't accept yet
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+
+def _add_update_without_sort(self, *args, sort=None, **kwargs):
+    return _add_update(self, *args, **kwargs)
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _add_update_without_sort
+
+from config import Config
+from core.models import CommitDetails, RepoDetails
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch) -> RepoDetails:
+    """A repository with two commits, served from a local bare remote."""
+    work = git.Repo.init(tmp_path / "work")
+    commits = []
+    for index in range(2):
+        (tmp_path / "work" / f"app_{index}.py").write_text(f"import os\nprint({index})\n")
+        work.index.add([f"app_{index}.py"])
+        commit = work.index.commit(f"commit {index}")
+        commits.append(CommitDetails(hash=commit.hexsha, message=commit.message, timestamp=datetime.now(), files={}, repo_url=""))
+    remotes = tmp_path / "remotes"
+    # Mirrors are cached by owner and name in the shared BASE_DIR, so each test gets its own owner
+    owner = tmp_path.name
+    work.clone(remotes / owner / "app.git", bare=True)
+    monkeypatch.setattr(Config, "GITHUB_REPO_BASE_URL", f"file://{remotes}/")
+    return RepoDetails(url=f"file://{remotes}/{owner}/app", name="app", commits=commits)
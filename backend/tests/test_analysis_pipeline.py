@@ -0,0 +1,50 @@
+import os
+from config import Config
+from core.models import AnalysisStatus, RepoDetails
+from db import MetricsWriteBuffer, db
+from services.analysis_pipeline import AnalysisPipeline
+from utils.local_git_util import local_git_util
+from utils.repo_cache import RepoCache, repo_cache
+from utils.skills_util import skills_util
+
+
+def run_pipeline(repo: RepoDetails) -> AnalysisPipeline:
+    status = AnalysisStatus(total_commits=len(repo.commits), analyzed_commits=0, analysis_completed=False)
+    with MetricsWriteBuffer(db, Config.METRICS_WRITE_BATCH_SIZE, Config.METRICS_WRITE_MAX_DELAY_SECONDS) as metrics_writer:
+        pipeline = AnalysisPipeline(status, True, metrics_writer)
+        pipeline.run([repo])
+    return pipeline
+
+
+def test_commits_of_a_failed_detection_are_reported_missing(repo, monkeypatch):
+    def identify_skills_for_commits(*args, **kwargs):
+        raise RuntimeError("detection failed")
+
+    monkeypatch.setattr(skills_util, "identify_skills_for_commits", identify_skills_for_commits)
+
+    pipeline = run_pipeline(repo)
+
+    assert pipeline.analyzed_commits == 2
+    assert pipeline.failed_commits == 2
+    assert repo_cache._leases == {}
+
+
+def test_commits_of_a_failed_fetch_are_reported_missing(repo, monkeypatch):
+    def clone_repo(repo_url):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(local_git_util, "clone_repo", clone_repo)
+
+    pipeline = run_pipeline(repo)
+
+    assert pipeline.analyzed_commits == 2
+    assert pipeline.failed_commits == 2
+
+
+def test_acquire_returns_none_for_a_broken_mirror(repo, tmp_path):
+    cache = RepoCache(str(tmp_path / "cache"), str(tmp_path / "worktrees"), max_bytes=1 << 30)
+    # A directory left behind by an interrupted clone isn't a repository
+    os.makedirs(cache._mirror_path(repo.url))
+
+    assert cache.acquire(repo.url) is None
+    assert cache._leases == {}
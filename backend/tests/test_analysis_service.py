@@ -0,0 +1,41 @@
+from core.models import AnalysisStatus
+from db import db
+from services.analysis_pipeline import AnalysisPipeline
+from services.analysis_service import Submission, analysis_service
+from utils.github_util import github_util
+
+
+def analyze(repo, username: str):
+    analysis_id = f"analysis-{username}"
+    analysis_service.submissions[analysis_id] = Submission(
+        username=username,
+        name=username,
+        skip_quality_metrics=True,
+        status=AnalysisStatus(total_commits=0, analyzed_commits=0, analysis_completed=False)
+    )
+    analysis_service.analyze(analysis_id, username, skip_quality_metrics=True)
+    return db.find_user_result(username, True)
+
+
+def test_result_with_dropped_commits_is_stored_without_fingerprint(repo, monkeypatch):
+    def detect(self, batch):
+        # Fails without reporting its commits, like an unexpected error in a stage handler
+        self._release(batch.repo_job)
+        raise RuntimeError("detection failed")
+
+    monkeypatch.setattr(github_util, "get_commits_for_user", lambda username: [repo])
+    monkeypatch.setattr(AnalysisPipeline, "_detect", detect)
+
+    result = analyze(repo, "dropped-commits")
+
+    assert result is not None
+    assert result.commit_fingerprint is None
+
+
+def test_complete_result_is_stored_with_fingerprint(repo, monkeypatch):
+    monkeypatch.setattr(github_util, "get_commits_for_user", lambda username: [repo])
+
+    result = analyze(repo, "complete")
+
+    assert result is not None
+    assert result.commit_fingerprint is not None
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.main import app
+from services.analysis_service import analysis_service
+from utils.github_util import github_util
+
+# Fewer than the default thread pool's minimum of 5 workers, so every lookup gets a thread
+CONCURRENT_SUBMITS = 4
+# Blocking time of the stubbed GitHub lookup
+USER_LOOKUP_SECONDS = 0.3
+# How long a held lookup waits to be released before giving up
+HOLD_TIMEOUT_SECONDS = 1.0
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60.0)
+
+
+@pytest.fixture
+def stub_analysis(monkeypatch):
+    """Replaces the analysis with a no-op so submits don't reach GitHub."""
+    monkeypatch.setattr(analysis_service, "analyze", lambda analysis_id, username, skip_quality_metrics=False: (None, None))
+
+
+def test_submits_run_concurrently(stub_analysis, monkeypatch):
+    def get_user(username):
+        time.sleep(USER_LOOKUP_SECONDS)
+        return SimpleNamespace(name=username)
+
+    monkeypatch.setattr(github_util, "get_user", get_user)
+
+    async def submit_all() -> float:
+        async with client() as http:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                http.post(f"/api/submit/concurrent-{index}") for index in range(CONCURRENT_SUBMITS)
+            ))
+            elapsed = time.perf_counter() - started
+        assert all(response.status_code == 200 for response in responses)
+        return elapsed
+
+    elapsed = asyncio.run(submit_all())
+
+    # Lookups run one after another if the handlers block the event loop
+    assert elapsed < CONCURRENT_SUBMITS * USER_LOOKUP_SECONDS / 2
+
+
+def test_status_is_served_while_submits_block(stub_analysis, monkeypatch):
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    timed_out = []
+
+    def get_user(username):
+        started.release()
+        if not release.wait(HOLD_TIMEOUT_SECONDS):
+            timed_out.append(username)
+        return SimpleNamespace(name=username)
+
+    monkeypatch.setattr(github_util, "get_user", get_user)
+
+    async def status_during_submits():
+        async with client() as http:
+            submits = asyncio.gather(*(
+                http.post(f"/api/submit/held-{index}") for index in range(CONCURRENT_SUBMITS)
+            ))
+            for _ in range(CONCURRENT_SUBMITS):
+                await asyncio.to_thread(started.acquire)
+            response = await http.get("/api/status/unknown")
+            assert response.status_code == 200
+            release.set()
+            await submits
+
+    asyncio.run(status_during_submits())
+
+    # The lookups are only released once the status request is answered, which a blocked event loop can't do
+    assert timed_out == []
@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from utils import ce_task_waiter as ce_task_waiter_module
+from utils.ce_task_waiter import ACTIVITY_PAGE_SIZE, CeTaskWaiter, PendingTask
+
+
+def test_tasks_missing_from_the_activity_pages_are_looked_up(monkeypatch):
+    task_calls = []
+
+    def get(url, params=None, headers=None):
+        if url.endswith("/api/ce/activity"):
+            # Every page is full, so the listing is cut off before the unlisted task
+            tasks = [{"id": f"other-{params['p']}-{i}", "status": "SUCCESS"} for i in range(ACTIVITY_PAGE_SIZE)]
+            if params["p"] == 1:
+                tasks[0] = {"id": "listed", "status": "SUCCESS"}
+            return SimpleNamespace(status_code=200, json=lambda: {"tasks": tasks})
+        task_calls.append(params["id"])
+        return SimpleNamespace(status_code=200, json=lambda: {"task": {"status": "SUCCESS"}})
+
+    monkeypatch.setattr(ce_task_waiter_module.http_sessions, "get", get)
+    waiter = CeTaskWaiter(1, 1, 60)
+    pending = {
+        task_id: PendingTask(future=Future(), submitted_at=datetime.now(timezone.utc), deadline=0)
+        for task_id in ["listed", "unlisted"]
+    }
+
+    assert waiter._poll(pending) == {"listed": "SUCCESS", "unlisted": "SUCCESS"}
+    assert task_calls == ["unlisted"]
@@ -0,0 +1,23 @@
+from core.models import BlobDetection
+from utils.detection_cache import DetectionCache
+
+
+def detection(detector_version: str) -> BlobDetection:
+    return BlobDetection(
+        blob_sha="a" * 40,
+        file_extension="py",
+        language="Python",
+        imports=["django"],
+        frameworks=["Django"],
+        detector_version=detector_version
+    )
+
+
+def test_detections_are_not_shared_between_content_modes():
+    full = DetectionCache(10, False, "max1048576:early-exit")
+    header = DetectionCache(10, False, "header16384:early-exit")
+    full.put_many([detection(full.version("2"))])
+
+    key = ("a" * 40, "py")
+    assert key in full.get_many([key], full.version("2"))
+    assert header.get_many([key], header.version("2")) == {}
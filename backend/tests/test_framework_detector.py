@@ -0,0 +1,68 @@
+import random
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from core.models import FileInfo
+from utils.framework_detector import FileInfoFrameworkDetector, framework_detector
+
+KNOWN_IMPORTS = [name for imports in FileInfoFrameworkDetector.FRAMEWORK_IMPORTS.values() for name in imports]
+UNKNOWN_IMPORTS = ["os", "sys", "./local", "lodash", "java.util.List", "github.com/pkg/errors"]
+
+
+def random_import_sets(count: int, seed: int = 0) -> list[set[str]]:
+    """Random mixes of known and unknown imports."""
+    rng = random.Random(seed)
+    pool = KNOWN_IMPORTS + UNKNOWN_IMPORTS
+    return [set(rng.sample(pool, rng.randint(1, 8))) for _ in range(count)]
+
+
+def test_import_index_matches_sklearn_tfidf():
+    vectorizer = TfidfVectorizer(
+        analyzer="word",
+        token_pattern=framework_detector.TOKEN_PATTERN.pattern,
+        min_df=1
+    )
+    tfidf_matrix = vectorizer.fit_transform(list(framework_detector.framework_docs.values()))
+
+    mismatches = []
+    for imports in random_import_sets(2000):
+        expected = cosine_similarity(vectorizer.transform([" ".join(imports)]), tfidf_matrix)[0]
+        actual = framework_detector.score_imports(imports)
+        same_scores = all(e == a for e, a in zip(expected, actual))
+        same_frameworks = all(
+            (e > framework_detector.SIMILARITY_THRESHOLD) == (a > framework_detector.SIMILARITY_THRESHOLD)
+            for e, a in zip(expected, actual)
+        )
+        if not (same_scores and same_frameworks):
+            mismatches.append(imports)
+
+    assert mismatches == []
+
+
+def file_info(index: int, imports: set[str]) -> FileInfo:
+    extension = ["py", "js", "java", "go"][index % 4]
+    content = "\n".join(f"import {name}" for name in sorted(imports))
+    return FileInfo(
+        file_path=f"file_{index}.{extension}",
+        file_extension=extension,
+        line_count=len(imports),
+        char_count=len(content),
+        additions=len(imports),
+        deletions=0,
+        content=content
+    )
+
+
+def test_batch_detection_matches_per_file_detection_near_the_threshold():
+    import_sets = random_import_sets(3000, seed=1)
+    threshold = framework_detector.SIMILARITY_THRESHOLD
+    near_threshold = [
+        imports for imports in import_sets
+        if any(abs(score - threshold) < 0.01 for score in framework_detector.score_imports(imports))
+    ]
+    assert len(near_threshold) >= 20
+    corpus = near_threshold + import_sets[:500] + [set(), {"os"}]
+    files = [file_info(index, imports) for index, imports in enumerate(corpus)]
+
+    batch = framework_detector.detect_frameworks_batch(files, corpus)
+
+    assert batch == [framework_detector.detect_frameworks(file, imports) for file, imports in zip(files, corpus)]
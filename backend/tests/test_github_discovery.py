@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+import httpx
+from utils.github_discovery import SEARCH_PAGE_SIZE, SEARCH_RESULT_LIMIT, GithubCommitDiscovery
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_commits(count: int) -> list[dict]:
+    """Search items for count commits, one hour apart, newest first."""
+    items = []
+    for index in reversed(range(count)):
+        date = (START + timedelta(hours=index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        items.append({
+            "sha": f"{index:040x}",
+            "commit": {"message": f"commit {index}", "author": {"date": date}},
+            "parents": [{"sha": "0" * 40}],
+            "repository": {"full_name": "owner/repo", "name": "repo", "url": "https://api.github.com/repos/owner/repo"},
+        })
+    return items
+
+
+def search_transport(items: list[dict], queries: list[str]) -> httpx.MockTransport:
+    """Serves the commit search like GitHub: at most SEARCH_RESULT_LIMIT results, newest first."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        query = request.url.params["q"]
+        queries.append(query)
+        until = None
+        for term in query.split():
+            if term.startswith("author-date:<="):
+                until = datetime.fromisoformat(term.removeprefix("author-date:<=").replace("Z", "+00:00"))
+        matches = [
+            item for item in items
+            if until is None or datetime.fromisoformat(item["commit"]["author"]["date"].replace("Z", "+00:00")) <= until
+        ]
+        page = int(request.url.params["page"])
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        returned = matches[:SEARCH_RESULT_LIMIT]
+        return httpx.Response(200, json={"total_count": len(matches), "items": returned[start:start + SEARCH_PAGE_SIZE]})
+
+    return httpx.MockTransport(handler)
+
+
+def test_discovers_commits_beyond_the_search_result_limit():
+    items = make_commits(1500)
+    queries = []
+    discovery = GithubCommitDiscovery("", "https://api.github.com", 3, transport=search_transport(items, queries))
+
+    result = discovery.discover("user")
+
+    assert result.complete
+    assert {commit.sha for commit in result.commits} == {item["sha"] for item in items}
+    assert any("author-date:<=" in query for query in queries)
+
+
+def test_incomplete_when_older_results_cant_be_searched():
+    items = make_commits(1500)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "author-date:<=" in request.url.params["q"]:
+            return httpx.Response(422, json={"message": "Validation Failed"})
+        page = int(request.url.params["page"])
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        return httpx.Response(200, json={"total_count": 1500, "items": items[:SEARCH_RESULT_LIMIT][start:start + SEARCH_PAGE_SIZE]})
+
+    discovery = GithubCommitDiscovery("", "https://api.github.com", 3, transport=httpx.MockTransport(handler))
+
+    result = discovery.discover("user")
+
+    assert not result.complete
+    assert len(result.commits) == SEARCH_RESULT_LIMIT
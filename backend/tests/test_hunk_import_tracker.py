@@ -0,0 +1,53 @@
+from datetime import datetime
+import git
+from config import Config
+from core.models import CommitDetails
+from utils.hunk_import_tracker import HunkImportTracker
+from utils.local_git_util import local_git_util
+from utils.skills_util import skills_util
+
+DJANGO_VIEW = "from django.db import models\nfrom django.http import HttpResponse\n\n" + "".join(
+    f"def view_{i}(request):\n    return HttpResponse({i})\n\n" for i in range(40)
+)
+
+
+def commit_file(repo: git.Repo, path: str, content: str, message: str) -> CommitDetails:
+    with open(f"{repo.working_tree_dir}/{path}", "w") as file:
+        file.write(content)
+    repo.index.add([path])
+    commit = repo.index.commit(message)
+    return CommitDetails(hash=commit.hexsha, message=message, timestamp=datetime.now(), files={}, repo_url="")
+
+
+def tracked_files(repo_path: str, commits: list[CommitDetails]) -> list:
+    tracker = HunkImportTracker(repo_path)
+    results = []
+    for commit in local_git_util.iter_commits_details(repo_path, commits, with_hunks=True, load_content=False):
+        for file in commit.files.values():
+            file.language = skills_util.identify_language(file)
+            results.append((file, tracker.track(file)))
+    return results
+
+
+def test_deletion_only_change_is_parsed_again(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    first = commit_file(repo, "views.py", DJANGO_VIEW, "add views")
+    second = commit_file(repo, "views.py", DJANGO_VIEW.replace("def view_39(request):\n    return HttpResponse(39)\n\n", ""), "drop a view")
+
+    (_, added), (_, deleted) = tracked_files(str(tmp_path), [first, second])
+
+    assert added.full_parse
+    assert deleted.full_parse
+    assert deleted.imports == {"django"}
+    assert deleted.content
+
+
+def test_truncated_header_is_not_a_full_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "BLOB_HEADER_BYTES", 64)
+    repo = git.Repo.init(tmp_path)
+    first = commit_file(repo, "views.py", DJANGO_VIEW, "add views")
+
+    [(_, tracked)] = tracked_files(str(tmp_path), [first])
+
+    assert tracked.imports == {"django"}
+    assert not tracked.full_parse
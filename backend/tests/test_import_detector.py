@@ -0,0 +1,88 @@
+import pytest
+from utils.import_detector import IMPORT_START_KEYWORDS, ImportDetector
+
+full_scan = ImportDetector(early_exit=False)
+early_exit = ImportDetector(early_exit=True)
+
+
+def find_imports_by_line(file_content, language):
+    """The original line-by-line scanner, which the regex scanner has to agree with."""
+    imports = set()
+    language_keywords = IMPORT_START_KEYWORDS.get(language)
+    if not language_keywords:
+        return imports
+    for line in file_content.splitlines():
+        stripped_line = line.strip()
+        if not stripped_line or stripped_line.startswith(('#', '//', '--', '/*')):
+            continue
+        for keyword, method in language_keywords:
+            if stripped_line.startswith(keyword):
+                module_name = full_scan._extract_module_name(stripped_line[len(keyword):], method)
+                if module_name:
+                    imports.add(module_name)
+                break
+    return imports
+
+
+PYTHON_LAZY_IMPORT = """\
+import os
+from django.db import models
+
+def export(rows):
+    import pandas
+    return pandas.DataFrame(rows)
+"""
+
+PHP_TRAIT_USE = """\
+<?php
+namespace App\\Models;
+
+use Illuminate\\Database\\Eloquent\\Model;
+
+class User extends Model
+{
+    use Illuminate\\Notifications\\Notifiable;
+}
+"""
+
+JS_LATE_REQUIRE = """\
+import express from 'express';
+
+function loadConfig() {
+    return {};
+}
+
+require('dotenv/config');
+"""
+
+SAMPLES = [
+    (PYTHON_LAZY_IMPORT, "Python", {"os", "django", "pandas"}),
+    (PHP_TRAIT_USE, "PHP", {"Illuminate\\Database\\Eloquent\\Model", "Illuminate\\Notifications\\Notifiable"}),
+    (JS_LATE_REQUIRE, "JavaScript", {"express", "dotenv/config"}),
+    ("import React from 'react';\n// import 'commented';\nimport './local.css';\n", "JavaScript", {"react", "./local.css"}),
+    ("package main\n\nimport \"net/http\"\n\nfunc main() {}\n", "Go", {"net/http"}),
+    ("use std::collections::HashMap;\nextern crate serde;\n", "Rust", {"std", "serde"}),
+    ("local socket = require(\"socket\")\n", "Lua", set()),
+]
+
+
+@pytest.mark.parametrize("content, language, expected", SAMPLES)
+def test_full_scan_matches_line_by_line_scanner(content, language, expected):
+    assert full_scan.find_imports_for_language(content, language) == expected
+    assert find_imports_by_line(content, language) == expected
+
+
+@pytest.mark.parametrize("content, language, missed", [
+    (PYTHON_LAZY_IMPORT, "Python", "pandas"),
+    (PHP_TRAIT_USE, "PHP", "Illuminate\\Notifications\\Notifiable"),
+    (JS_LATE_REQUIRE, "JavaScript", "dotenv/config"),
+])
+def test_early_exit_misses_imports_below_the_import_block(content, language, missed):
+    imports = early_exit.find_imports_for_language(content, language)
+
+    assert missed not in imports
+    assert imports < full_scan.find_imports_for_language(content, language)
+
+
+def test_full_scan_is_the_default():
+    assert not ImportDetector().early_exit
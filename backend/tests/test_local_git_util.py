@@ -0,0 +1,35 @@
+from datetime import datetime
+import git
+from core.models import CommitDetails
+from utils.blob_reader import blob_reader_pool
+from utils.local_git_util import local_git_util
+
+
+def commit_file(repo: git.Repo, path: str, content: str) -> CommitDetails:
+    with open(f"{repo.working_tree_dir}/{path}", "w") as file:
+        file.write(content)
+    repo.index.add([path])
+    commit = repo.index.commit(f"add {path}")
+    return CommitDetails(hash=commit.hexsha, message=commit.message, timestamp=datetime.now(), files={}, repo_url="")
+
+
+def test_contents_are_read_when_requested(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    commit = commit_file(repo, "app.py", "import os\n")
+
+    [details] = local_git_util.iter_commits_details(str(tmp_path), [commit])
+    blob_reader_pool.close(str(tmp_path))
+
+    assert details.files["app.py"].content == "import os\n"
+    assert details.files["app.py"].line_count == 1
+
+
+def test_no_blob_reader_is_started_without_contents(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    commit = commit_file(repo, "app.py", "import os\n")
+
+    [details] = local_git_util.iter_commits_details(str(tmp_path), [commit], load_content=False)
+
+    assert details.files["app.py"].blob_sha is not None
+    assert details.files["app.py"].content == ""
+    assert str(tmp_path) not in blob_reader_pool._readers
@@ -0,0 +1,59 @@
+from datetime import datetime
+import pytest
+from config import Config
+from core.models import CommitDetails, FileInfo
+from utils.metrics_util import metrics_util
+from utils.quality_scan import quality_scan
+from utils.skills_util import skills_util
+
+
+def file_info(path: str, blob_sha: str | None = "b" * 40) -> FileInfo:
+    return FileInfo(
+        file_path=path,
+        file_extension=path.rsplit(".", 1)[-1],
+        line_count=1,
+        char_count=1,
+        additions=1,
+        deletions=0,
+        blob_sha=blob_sha
+    )
+
+
+def commit(*files: FileInfo) -> CommitDetails:
+    commit_details = CommitDetails(hash="c" * 40, message="", timestamp=datetime.now(), files={file.file_path: file for file in files}, repo_url="")
+    for file in files:
+        file.language = skills_util.identify_language(file)
+    return commit_details
+
+
+@pytest.fixture(autouse=True)
+def changed_files_only(monkeypatch):
+    monkeypatch.setattr(Config, "QUALITY_SCAN_CHANGED_FILES_ONLY", True)
+
+
+def test_inclusions_leave_out_unknown_languages_and_deleted_files():
+    commit_details = commit(file_info("app.py"), file_info("notes.unknownext"), file_info("old.py", blob_sha=None))
+
+    inclusions = metrics_util.get_scan_inclusions(commit_details, skills_util.identify_excluded_files(commit_details))
+
+    assert inclusions == ["app.py"]
+
+
+def test_commit_without_scannable_files_is_not_scanned(monkeypatch):
+    def analyze_commit_files(*args, **kwargs):
+        raise AssertionError("the scanner should not run")
+
+    monkeypatch.setattr(quality_scan, "analyze_commit_files", analyze_commit_files)
+    commit_details = commit(file_info("notes.unknownext"), file_info("old.py", blob_sha=None))
+
+    quality_metrics = metrics_util.get_quality_metrics(commit_details, skills_util.identify_excluded_files(commit_details), "/nonexistent")
+
+    assert quality_metrics is not None
+    assert quality_metrics.bugs == {}
+
+
+def test_start_scan_refuses_an_empty_inclusion_list():
+    task_id, error = quality_scan.start_scan("c" * 40, "/nonexistent", [])
+
+    assert task_id is None
+    assert error
@@ -0,0 +1,57 @@
+import os
+import git
+import pytest
+from config import Config
+from utils.repo_cache import RepoCache
+
+
+@pytest.fixture
+def remotes(tmp_path, monkeypatch):
+    """Two repositories with one commit each, served as owner/small and owner/other."""
+    remotes_dir = tmp_path / "remotes"
+    for name in ["small", "other"]:
+        work = git.Repo.init(tmp_path / "work" / name)
+        (tmp_path / "work" / name / "README.md").write_text(name * 1000)
+        work.index.add(["README.md"])
+        work.index.commit("initial")
+        work.clone(remotes_dir / "owner" / f"{name}.git", bare=True)
+    monkeypatch.setattr(Config, "GITHUB_REPO_BASE_URL", f"file://{remotes_dir}/")
+    return f"file://{remotes_dir}/owner/"
+
+
+def test_evicts_only_when_a_mirror_is_cloned(tmp_path, remotes, monkeypatch):
+    cache = RepoCache(str(tmp_path / "cache"), str(tmp_path / "worktrees"), max_bytes=0)
+    evictions = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(True) or evict())
+
+    mirror = cache.acquire(remotes + "small")
+    cache.release(mirror)
+    cache.acquire(remotes + "small")
+
+    assert len(evictions) == 1
+
+
+def test_repo_locks_are_dropped_once_unused(tmp_path, remotes):
+    cache = RepoCache(str(tmp_path / "cache"), str(tmp_path / "worktrees"), max_bytes=0)
+
+    small = cache.acquire(remotes + "small")
+    cache.release(small)
+    # Cloning the second mirror evicts the first, which no analysis holds anymore
+    other = cache.acquire(remotes + "other")
+
+    assert not os.path.exists(small)
+    assert os.path.exists(other)
+    assert cache._repo_locks == {}
+
+
+def test_evict_skips_mirrors_removed_while_listing(tmp_path, remotes, monkeypatch):
+    cache = RepoCache(str(tmp_path / "cache"), str(tmp_path / "worktrees"), max_bytes=0)
+    small = cache.acquire(remotes + "small")
+    cache.release(small)
+    list_mirrors = cache._list_mirrors
+    monkeypatch.setattr(cache, "_list_mirrors", lambda: list_mirrors() + [str(tmp_path / "cache" / "owner" / "gone.git")])
+
+    cache.evict()
+
+    assert not os.path.exists(small)
@@ -0,0 +1,38 @@
+from concurrent.futures import Future
+from datetime import datetime
+import git
+from config import Config
+from core.models import CommitDetails
+from utils import detection_worker
+from utils.blob_reader import blob_reader_pool
+from utils.detection_cache import detection_cache
+from utils.local_git_util import local_git_util
+from utils.skills_util import skills_util
+
+
+def test_crashed_worker_chunks_are_detected_with_the_pooled_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SKILLS_PROCESS_WORKERS", 1)
+    monkeypatch.setattr(detection_cache, "persist", False)
+
+    def crashed_pool(repo_path, files):
+        future = Future()
+        future.set_exception(RuntimeError("worker died"))
+        return [(files, future)]
+
+    monkeypatch.setattr(skills_util, "_submit_to_processes", crashed_pool)
+    repo = git.Repo.init(tmp_path)
+    (tmp_path / "models.py").write_text("from django.db import models\n\nclass Product(models.Model):\n    pass\n")
+    repo.index.add(["models.py"])
+    hexsha = repo.index.commit("add models").hexsha
+    commits = list(local_git_util.iter_commits_details(
+        str(tmp_path),
+        [CommitDetails(hash=hexsha, message="", timestamp=datetime.now(), files={}, repo_url="")],
+        load_content=False
+    ))
+
+    [(_, languages, frameworks)] = skills_util.identify_skills_for_commits(commits, repo_path=str(tmp_path))
+    blob_reader_pool.close(str(tmp_path))
+
+    assert languages == ["Python"]
+    assert frameworks == ["Django"]
+    assert str(tmp_path) not in detection_worker._readers
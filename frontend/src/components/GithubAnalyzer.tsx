@@ -41,6 +41,8 @@ interface AnalysisStatus {
   total_commits: number;
   analyzed_commits: number;
   analysis_completed: boolean;
+  priority?: number;
+  queue_position?: number | null;
 }
 
 interface AnalyzeResponse {